@@ -0,0 +1,398 @@
+#!/usr/bin/env python3
+
+import sys, csv, heapq
+from collections import deque
+from options import parseOptions
+import logger, metrics
+
+"""
+Streaming analyzer for Sender_log.txt and Receiver_log.txt
+
+Both logs (text or binary, see logger.py) are read one event at a time and
+merged by time, after moving the receiver's clock onto the sender's with
+the Syn both of them logged. Only segments that are not cumulatively acked
+yet are kept in memory, so memory does not grow with the log.
+
+For every segment the timeline is first send, every later (re)send, first
+arrival at the receiver and the ACK that covered it. On top of that come
+goodput per interval, retransmission timeouts (a retransmit with no ACK
+in the FAST_WINDOW before it, the RTO observed being the time since that
+segment was last sent and the time lost the silence since the last ACK)
+and bursts of duplicate ACKs for the same byte.
+
+A summary goes to stdout. --csv=prefix writes prefix.segments.csv (one row
+per segment), prefix.goodput.csv (one row per interval) and
+prefix.events.csv (timeouts and dup ACK bursts) for plotting.
+
+Usage: ./analyze.py Sender_log.txt [Receiver_log.txt] [--csv=prefix]
+    [--interval=seconds]
+"""
+
+# a retransmit this soon after an ACK was triggered by it, text logs only
+# keep hundredths of a second
+FAST_WINDOW = 0.011
+
+OPTIONS = {
+    "csv": "",
+    "interval": 0.1,        # seconds per goodput row
+}
+
+# sender and receiver events in the merged stream, the receiver's first
+# when both happen at the same moment
+RECEIVER = 0
+SENDER = 1
+
+class Segment:
+    __slots__ = ("seq", "size", "firstSend", "lastSend", "sends", "drops", \
+        "corrupted", "arrived", "arrivals", "acked")
+
+    def __init__(self, seq, size):
+        self.seq = seq
+        self.size = size
+        self.firstSend = None
+        self.lastSend = None
+        self.sends = 0
+        self.drops = 0
+        self.corrupted = 0
+        self.arrived = None
+        self.arrivals = 0
+        self.acked = None
+
+# yields (time - offset, side, index, type, symbol, seq, size, ack) for
+# every event of a log, skipping the stats blocks, index keeps the events
+# of one log in their order when the merge sees equal times
+def readLog(path, side=0, offset=0):
+    with open(path, 'rb') as file:
+        head = file.read(1)
+    if(head and head[0] in (logger.KIND_EVENT, logger.KIND_TEXT)):
+        with open(path, 'rb') as file:
+            index = 0
+            for kind, record in logger.readBinary(file):
+                if(kind == "event"):
+                    when, type, symbol, seq, size, ack = record
+                    yield when - offset, side, index, type, symbol, seq, size, ack
+                    index += 1
+        return
+
+    with open(path) as file:
+        index = 0
+        for line in file:
+            # events are padded to the right, stats lines start with text
+            if(line[0] != " "):
+                continue
+            type, when, symbol, seq, size, ack = line.split()
+            yield float(when) - offset, side, index, type, symbol, int(seq), \
+                int(size), int(ack)
+            index += 1
+
+# when the log first saw a Syn of the given type, it is one of the first
+# few events
+def synTime(path, type):
+    for event in readLog(path):
+        if(event[4] == "S" and event[3] == type):
+            return event[0]
+        if(event[2] > 100):
+            return None
+
+class Analyzer:
+    def __init__(self, interval, segmentsOut=None, goodputOut=None, eventsOut=None):
+        self.interval = interval
+        self.segmentsOut = segmentsOut
+        self.goodputOut = goodputOut
+        self.eventsOut = eventsOut
+
+        # segments not cumulatively acked yet, by seq and in first send order
+        self.segments = {}
+        self.order = deque()
+        self.frontier = 1
+        # one past the last byte sent, the ACK of the Fin goes one further
+        self.highest = 1
+        self.lastAck = None
+        self.lastTimeout = None
+
+        self.events = [0, 0]
+        self.start = None
+        self.end = 0
+        self.acked = 0
+        self.completed = 0
+        self.retransmitted = 0
+        self.retransmits = 0
+        self.mostSends = 0
+        self.delivery = metrics.Histogram("delivery", "")
+        self.ackLatency = metrics.Histogram("ack", "")
+
+        self.timeouts = 0
+        self.timeLost = 0
+        self.rtos = metrics.Histogram("rto", "")
+
+        self.burstAck = None
+        self.burstStart = 0
+        self.burstLength = 0
+        self.bursts = 0
+        self.longBursts = 0
+        self.longestBurst = 0
+
+        # the goodput interval being counted
+        self.bucket = 0
+        self.bucketAcked = 0
+        self.bucketSent = 0
+        self.bucketRetransmits = 0
+        self.peakGoodput = 0
+
+    def run(self, events):
+        counts = self.events
+        interval = self.interval
+        for when, side, index, type, symbol, seq, size, ack in events:
+            counts[side] += 1
+            if(side == RECEIVER):
+                if(symbol == "D" and seq >= self.frontier):
+                    self.arrive(when, type, seq, size)
+                continue
+
+            if(self.start is None):
+                self.start = when
+            self.end = when
+            bucket = int(when / interval)
+            if(bucket != self.bucket):
+                self.closeBucket(bucket)
+
+            if(symbol == "D"):
+                self.send(when, type, seq, size)
+            elif(symbol == "A" and type != "snd"):
+                self.ack(when, type, ack)
+        self.finish()
+
+    def send(self, when, type, seq, size):
+        segment = self.segments.get(seq)
+        if(segment is None):
+            if(seq < self.frontier):
+                # acked already, a late copy out of PLD
+                return
+            segment = self.segments[seq] = Segment(seq, size)
+            self.order.append(seq)
+            self.highest = max(self.highest, seq + size)
+        if(type == "drop"):
+            segment.drops += 1
+        elif(type == "snd/corr"):
+            segment.corrupted += 1
+
+        if(segment.firstSend is None):
+            segment.firstSend = when
+        elif(type != "snd/dup"):
+            # every send after the first is a retransmission
+            self.retransmits += 1
+            self.bucketRetransmits += 1
+            if(segment.sends == 1):
+                self.retransmitted += 1
+            self.checkTimeout(when, segment)
+        segment.lastSend = when
+        segment.sends += 1
+        self.bucketSent += 1
+
+    def checkTimeout(self, when, segment):
+        if(self.lastAck is not None and when - self.lastAck <= FAST_WINDOW):
+            return
+        # the holes resent along with the oldest segment are the same timeout
+        if(self.lastTimeout is not None and self.lastTimeout >= (self.lastAck or 0) \
+                and when - self.lastTimeout <= FAST_WINDOW):
+            return
+
+        previous = self.lastTimeout
+        self.lastTimeout = when
+        rto = when - segment.lastSend
+        # the silence since anything last happened, back to back timeouts
+        # don't count the same stretch twice
+        quiet = max(self.lastAck or 0, previous or 0, segment.lastSend)
+        lost = when - quiet
+        self.timeouts += 1
+        self.timeLost += lost
+        self.rtos.observe(rto)
+        if(self.eventsOut is not None):
+            self.eventsOut.writerow(("timeout", round(when, 4), segment.seq, \
+                round(rto, 4), round(lost, 4)))
+
+    def ack(self, when, type, ack):
+        self.lastAck = when
+        if(type == "rcv/DA"):
+            if(ack == self.burstAck):
+                self.burstLength += 1
+            else:
+                self.closeBurst(when)
+                self.burstAck = ack
+                self.burstStart = when
+                self.burstLength = 1
+            return
+
+        if(self.burstLength):
+            self.closeBurst(when)
+        ack = min(ack, self.highest)
+        if(ack <= self.frontier):
+            return
+        self.acked += ack - self.frontier
+        self.bucketAcked += ack - self.frontier
+        self.frontier = ack
+
+        segments = self.segments
+        order = self.order
+        while(order and order[0] < ack):
+            segment = segments.get(order[0])
+            if(segment is not None and segment.seq + segment.size > ack):
+                break
+            order.popleft()
+            if(segment is not None):
+                del segments[segment.seq]
+                segment.acked = when
+                self.complete(segment)
+
+    def closeBurst(self, when):
+        if(not self.burstLength):
+            return
+
+        self.bursts += 1
+        if(self.burstLength >= 3):
+            self.longBursts += 1
+        self.longestBurst = max(self.longestBurst, self.burstLength)
+        if(self.eventsOut is not None):
+            self.eventsOut.writerow(("dupacks", round(self.burstStart, 4), \
+                self.burstAck, self.burstLength, round(when - self.burstStart, 4)))
+        self.burstAck = None
+        self.burstLength = 0
+
+    def closeBucket(self, bucket):
+        goodput = self.bucketAcked / self.interval / 1e6
+        self.peakGoodput = max(self.peakGoodput, goodput)
+        if(self.goodputOut is not None):
+            self.goodputOut.writerow((round(self.bucket * self.interval, 4), \
+                self.bucketAcked, round(goodput, 4), self.bucketSent, \
+                self.bucketRetransmits))
+            # nothing happened in the intervals skipped over
+            for empty in range(self.bucket + 1, bucket):
+                self.goodputOut.writerow((round(empty * self.interval, 4), 0, 0, 0, 0))
+        self.bucket = bucket
+        self.bucketAcked = 0
+        self.bucketSent = 0
+        self.bucketRetransmits = 0
+
+    def arrive(self, when, type, seq, size):
+        segment = self.segments.get(seq)
+        if(segment is None):
+            # the clocks only line up to within a log tick
+            segment = self.segments[seq] = Segment(seq, size)
+            self.order.append(seq)
+            self.highest = max(self.highest, seq + size)
+        if(type == "rcv"):
+            if(segment.arrived is None):
+                segment.arrived = when
+            segment.arrivals += 1
+
+    def complete(self, segment):
+        self.completed += 1
+        self.mostSends = max(self.mostSends, segment.sends)
+        if(segment.firstSend is not None):
+            if(segment.arrived is not None):
+                self.delivery.observe(max(segment.arrived - segment.firstSend, 0))
+            if(segment.acked is not None):
+                self.ackLatency.observe(segment.acked - segment.firstSend)
+        if(self.segmentsOut is not None):
+            self.segmentsOut.writerow((segment.seq, segment.size, \
+                rounded(segment.firstSend), rounded(segment.lastSend), \
+                segment.sends, segment.drops, segment.corrupted, \
+                rounded(segment.arrived), segment.arrivals, rounded(segment.acked)))
+
+    def finish(self):
+        self.closeBurst(self.end)
+        self.closeBucket(self.bucket + 1)
+        # never acked, the transfer was cut short
+        for seq in self.order:
+            segment = self.segments.pop(seq, None)
+            if(segment is not None):
+                self.complete(segment)
+        self.order.clear()
+
+    def summary(self):
+        elapsed = self.end - (self.start or 0)
+        lines = [
+            "Events (sender, receiver)      " + str(self.events[SENDER]) + ", " + \
+                str(self.events[RECEIVER]),
+            "Bytes acked                    " + str(self.acked),
+            "Duration (s)                   " + "{:.3f}".format(elapsed),
+            "Goodput (MB/s)                 " + "{:.3f}".format(self.acked / \
+                elapsed / 1e6 if elapsed else 0),
+            "Peak goodput (MB/s)            " + "{:.3f}".format(self.peakGoodput) + \
+                " per " + str(self.interval) + " s",
+            "Segments                       " + str(self.completed),
+            "Segments retransmitted         " + str(self.retransmitted) + " (" + \
+                str(self.retransmits) + " retransmissions, at most " + \
+                str(self.mostSends) + " sends of one)",
+            "Send to arrival (s)            " + spread(self.delivery),
+            "Send to ACK (s)                " + spread(self.ackLatency),
+            "Timeouts                       " + str(self.timeouts),
+            "Time lost to timeouts (s)      " + "{:.3f}".format(self.timeLost),
+            "Observed RTO (s)               " + spread(self.rtos),
+            "Dup ACK bursts                 " + str(self.bursts) + " (" + \
+                str(self.longBursts) + " of 3 or more, longest " + \
+                str(self.longestBurst) + ")",
+        ]
+
+        return "\n".join(lines)
+
+def rounded(value):
+    return "" if value is None else round(value, 4)
+
+# mean and approximate median and 99th percentile of a histogram
+def spread(histogram):
+    if(not histogram.count):
+        return "-"
+    return "mean {:.4f}, p50 <= {}, p99 <= {}".format(histogram.sum / \
+        histogram.count, quantile(histogram, 0.5), quantile(histogram, 0.99))
+
+# the upper bound of the bucket the quantile falls in
+def quantile(histogram, fraction):
+    rank = fraction * histogram.count
+    for bound, count in zip(list(histogram.bounds) + ["+Inf"], histogram.cumulative()):
+        if(count >= rank):
+            return bound
+
+def main():
+    msg = "Usage: ./analyze.py Sender_log.txt [Receiver_log.txt] [--csv=prefix] " \
+        "[--interval=seconds]"
+    paths = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    options = parseOptions([arg for arg in sys.argv[1:] if arg.startswith("--")], \
+        OPTIONS, msg)
+    if(len(paths) not in (1, 2)):
+        sys.exit(msg)
+
+    files = []
+    writers = [None, None, None]
+    if(options["csv"]):
+        headers = [
+            ("segments", ("seq", "size", "first_send", "last_send", "sends", "drops", \
+                "corrupted", "arrived", "arrivals", "acked")),
+            ("goodput", ("time", "acked_bytes", "goodput_mbs", "sent", "retransmits")),
+            ("events", ("event", "time", "seq_or_ack", "value", "seconds")),
+        ]
+        for i, (name, header) in enumerate(headers):
+            file = open(options["csv"] + "." + name + ".csv", 'w', newline='')
+            files.append(file)
+            writers[i] = csv.writer(file)
+            writers[i].writerow(header)
+
+    events = readLog(paths[0], SENDER)
+    if(len(paths) == 2):
+        synSent = synTime(paths[0], "snd")
+        synReceived = synTime(paths[1], "rcv")
+        offset = 0
+        if(synSent is not None and synReceived is not None):
+            offset = synReceived - synSent
+        events = heapq.merge(events, readLog(paths[1], RECEIVER, offset))
+
+    analyzer = Analyzer(options["interval"], *writers)
+    try:
+        analyzer.run(events)
+    finally:
+        for file in files:
+            file.close()
+    print(analyzer.summary())
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+import ctypes, ctypes.util, errno, socket, sys
+
+"""
+Batched datagram output
+
+Datagrams are queued with add() and written out together by flush(). On
+Linux a flush is a single sendmmsg() call (through ctypes) for the whole
+queue, elsewhere it falls back to a tight send loop. Datagrams without an
+address go to the socket's connected peer.
+
+A datagram is either one buffer or a (header, payload) pair from
+wire.encode(), which goes out with scatter/gather I/O (two iovecs, or
+sendmsg() in the loop) so the payload is never joined to its header.
+Buffers sendmmsg() cannot point at directly (read-only memoryviews) are
+copied on that path only.
+"""
+
+# sendmmsg takes at most this many messages per call (UIO_MAXIOV)
+MAX_BATCH = 1024
+# iovecs per message, a header and a payload
+PARTS = 2
+
+class iovec(ctypes.Structure):
+    # c_char_p so a bytes object can be assigned (and kept alive) directly
+    _fields_ = [("iov_base", ctypes.c_char_p), ("iov_len", ctypes.c_size_t)]
+
+class msghdr(ctypes.Structure):
+    _fields_ = [("msg_name", ctypes.c_void_p), ("msg_namelen", ctypes.c_uint32), \
+        ("msg_iov", ctypes.POINTER(iovec)), ("msg_iovlen", ctypes.c_size_t), \
+        ("msg_control", ctypes.c_void_p), ("msg_controllen", ctypes.c_size_t), \
+        ("msg_flags", ctypes.c_int)]
+
+class mmsghdr(ctypes.Structure):
+    _fields_ = [("msg_hdr", msghdr), ("msg_len", ctypes.c_uint)]
+
+class sockaddr_in(ctypes.Structure):
+    _fields_ = [("sin_family", ctypes.c_ushort), ("sin_port", ctypes.c_uint16), \
+        ("sin_addr", ctypes.c_uint8 * 4), ("sin_zero", ctypes.c_uint8 * 8)]
+
+def sockaddr(address):
+    name = sockaddr_in()
+    name.sin_family = socket.AF_INET
+    name.sin_port = socket.htons(address[1])
+    name.sin_addr[:] = socket.inet_aton(address[0])
+
+    return name
+
+def loadSendmmsg():
+    if(not sys.platform.startswith("linux")):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or None, use_errno=True)
+        sendmmsg = libc.sendmmsg
+    except (OSError, AttributeError):
+        return None
+
+    sendmmsg.argtypes = [ctypes.c_int, ctypes.POINTER(mmsghdr), ctypes.c_uint, \
+        ctypes.c_int]
+    sendmmsg.restype = ctypes.c_int
+    return sendmmsg
+
+sendmmsg = loadSendmmsg()
+
+class Batch:
+    def __init__(self, sock, useSendmmsg=True):
+        self.sock = sock
+        self.queue = []
+        self.names = {}
+        self.iovs = None
+        self.msgs = None
+        self.named = 0          # headers below this index may hold an address
+        self.sendmmsg = sendmmsg if useSendmmsg else None
+        if(sock.family != socket.AF_INET):
+            self.sendmmsg = None
+        self.calls = 0
+        self.datagrams = 0
+
+    def __len__(self):
+        return len(self.queue)
+
+    def add(self, data, address=None):
+        self.queue.append((data, address))
+
+    # drops the cached sockaddr of a peer that is gone
+    def forget(self, address):
+        self.names.pop(address, None)
+
+    # writes out as much of the queue as the socket takes, whatever it
+    # refuses right now stays queued for the next flush
+    def flush(self):
+        queue = self.queue
+        while(queue):
+            if(self.sendmmsg is not None):
+                sent = self.flushMmsg(queue[:MAX_BATCH])
+            else:
+                sent = self.flushLoop(queue)
+            self.calls += 1
+            if(not sent):
+                break
+            self.datagrams += sent
+            del queue[:sent]
+
+    # the message headers are built once and only refilled on every flush
+    def allocate(self):
+        self.iovs = (iovec * (PARTS * MAX_BATCH))()
+        self.msgs = (mmsghdr * MAX_BATCH)()
+        for i in range(MAX_BATCH):
+            self.msgs[i].msg_hdr.msg_iov = ctypes.pointer(self.iovs[PARTS * i])
+            self.msgs[i].msg_hdr.msg_iovlen = 1
+
+    def flushMmsg(self, datagrams):
+        if(self.msgs is None):
+            self.allocate()
+        iovs = self.iovs
+        msgs = self.msgs
+        count = len(datagrams)
+        # what the iovecs point into stays alive until the call returns
+        pinned = []
+        for i, (data, address) in enumerate(datagrams):
+            if(type(data) is tuple):
+                header, payload = data
+                iov = iovs[PARTS * i]
+                iov.iov_base = header
+                iov.iov_len = len(header)
+                iov = iovs[PARTS * i + 1]
+                iov.iov_base = self.pointer(payload, pinned)
+                iov.iov_len = len(payload)
+                msgs[i].msg_hdr.msg_iovlen = PARTS
+            else:
+                iov = iovs[PARTS * i]
+                iov.iov_base = self.pointer(data, pinned)
+                iov.iov_len = len(data)
+                msgs[i].msg_hdr.msg_iovlen = 1
+            if(address is not None):
+                name = self.names.get(address)
+                if(name is None):
+                    name = self.names[address] = sockaddr(address)
+                hdr = msgs[i].msg_hdr
+                hdr.msg_name = ctypes.addressof(name)
+                hdr.msg_namelen = ctypes.sizeof(name)
+                if(i >= self.named):
+                    self.named = i + 1
+            elif(i < self.named):
+                hdr = msgs[i].msg_hdr
+                hdr.msg_name = None
+                hdr.msg_namelen = 0
+
+        sent = self.sendmmsg(self.sock.fileno(), msgs, count, 0)
+        if(sent < 0):
+            err = ctypes.get_errno()
+            if(err in (errno.EAGAIN, errno.EWOULDBLOCK, errno.ENOBUFS)):
+                return 0
+            raise OSError(err, "sendmmsg: " + errno.errorcode.get(err, str(err)))
+
+        return sent
+
+    # what an iov_base can be set to for buffer
+    def pointer(self, buffer, pinned):
+        if(type(buffer) is bytes):
+            return buffer
+        view = memoryview(buffer)
+        if(view.readonly or not view.nbytes):
+            return bytes(view)
+
+        array = (ctypes.c_char * view.nbytes).from_buffer(view)
+        pinned.append(array)
+        return ctypes.cast(array, ctypes.c_char_p)
+
+    def flushLoop(self, datagrams):
+        sock = self.sock
+        sent = 0
+        for data, address in datagrams:
+            try:
+                if(type(data) is tuple):
+                    if(address is None):
+                        sock.sendmsg(data)
+                    else:
+                        sock.sendmsg(data, (), 0, address)
+                elif(address is None):
+                    sock.send(data)
+                else:
+                    sock.sendto(data, address)
+            except BlockingIOError:
+                break
+            sent += 1
+
+        return sent
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+
+import os, sys, time, random, tempfile, subprocess
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+import logger
+
+"""
+Time analyze.py on generated sender and receiver logs.
+
+The logs look like a lossy transfer: every segment is sent and acked, one
+in lossEvery is dropped, answered by three duplicate ACKs and resent.
+The analyzer's peak RSS is reported to show it does not grow with the log.
+
+Usage: ./bench_analyze.py [sender_lines]
+"""
+
+MSS = 1000
+
+def generate(lines, senderPath, receiverPath, lossEvery=50):
+    rng = random.Random(1)
+    when = 0.0
+    seq = 1
+    count = 0
+    with open(senderPath, 'w') as sender, open(receiverPath, 'w') as receiver:
+        sender.write(logger.LINE.format("snd", 0.0, "S", 0, 0, 0))
+        receiver.write(logger.LINE.format("rcv", 0.0, "S", 0, 0, 0))
+        while(count < lines):
+            when += rng.random() * 0.0002
+            t = round(when, 2)
+            if(seq // MSS % lossEvery == lossEvery - 1):
+                sender.write(logger.LINE.format("drop", t, "D", seq, MSS, 1))
+                for i in range(3):
+                    sender.write(logger.LINE.format("rcv/DA", t, "A", 1, 0, seq))
+                sender.write(logger.LINE.format("snd/RXT", t, "D", seq, MSS, 1))
+                count += 5
+            else:
+                sender.write(logger.LINE.format("snd", t, "D", seq, MSS, 1))
+                count += 1
+            receiver.write(logger.LINE.format("rcv", t, "D", seq, MSS, 1))
+            receiver.write(logger.LINE.format("snd", t, "A", 1, 0, seq + MSS))
+            sender.write(logger.LINE.format("rcv", t, "A", 1, 0, seq + MSS))
+            count += 1
+            seq += MSS
+
+def main():
+    lines = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    work = tempfile.mkdtemp(prefix="stp-analyze-")
+    senderPath = os.path.join(work, "Sender_log.txt")
+    receiverPath = os.path.join(work, "Receiver_log.txt")
+    try:
+        generate(lines, senderPath, receiverPath)
+        for paths in ([senderPath], [senderPath, receiverPath]):
+            start = time.time()
+            process = subprocess.Popen([sys.executable, \
+                os.path.join(ROOT, "analyze.py")] + paths, stdout=subprocess.DEVNULL)
+            usage = os.wait4(process.pid, 0)[2]
+            elapsed = time.time() - start
+            total = sum(sum(1 for line in open(path)) for path in paths)
+            print('{:>10} lines\t{:>8.2f} s\t{:>10.0f} lines/s\t{:>8} KB peak RSS'.format(\
+                total, elapsed, total / elapsed, usage.ru_maxrss))
+    finally:
+        for path in (senderPath, receiverPath):
+            if(os.path.exists(path)):
+                os.unlink(path)
+        os.rmdir(work)
+
+if __name__ == "__main__":
+    main()
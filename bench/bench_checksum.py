@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+
+import os, sys, random, time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+import checksum
+
+"""
+Checks checksum.py against the original per-byte implementation and
+measures throughput on test2.pdf sized inputs.
+
+Usage: ./bench_checksum.py [file]
+"""
+
+# the original checkSum() from sender.py / receiver.py
+def legacyCheckSum(msg):
+    s = 0
+    for i in range(0, len(msg), 2):
+        if(i + 1 < len(msg)):
+            a = msg[i]
+            b = msg[i + 1]
+            s = s + (a+(b << 8))
+        elif(i + 1 == len(msg)):
+            s += msg[i]
+    s = s + (s >> 16)
+    s = ~s & 0xffff
+
+    return s
+
+def verify(data):
+    rand = random.Random(0)
+    cases = [b"", b"\x01", b"\xff\xff", b"\xff" * 65535, data]
+    for i in range(2000):
+        start = rand.randrange(len(data))
+        cases.append(data[start:start + rand.randrange(1, 4097)])
+
+    for msg in cases:
+        expected = legacyCheckSum(msg)
+        assert checksum.checkSum(msg) == expected, len(msg)
+        assert checksum.checkSum(memoryview(msg)) == expected, len(msg)
+
+    print("checksum matches the original on " + str(len(cases)) + " inputs")
+
+def throughput(name, func, data, mss):
+    start = time.perf_counter()
+    for offset in range(0, len(data), mss):
+        func(data[offset:offset + mss])
+    elapsed = time.perf_counter() - start
+
+    print('{:>8}\t{:>8}\t{:>10.3f}\t{:>10.1f}'.format(\
+        name, mss, elapsed, len(data) / elapsed / 1e6))
+
+def main():
+    path = sys.argv[1] if len(sys.argv) > 1 else os.path.join(ROOT, "test2.pdf")
+    data = open(path, 'rb').read()
+
+    verify(data)
+
+    print('{:>8}\t{:>8}\t{:>10}\t{:>10}'.format("impl", "MSS", "secs", "MB/s"))
+    for mss in [150, 1000, 4000, len(data)]:
+        throughput("legacy", legacyCheckSum, data, mss)
+        throughput("fast", checksum.checkSum, data, mss)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+
+import os, sys, shutil, tempfile
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+from options import parseOptions
+from bench_suite import transfer, inputPath
+
+"""
+Compare forward error correction against plain retransmission.
+
+The same file is sent at every --pdrop with each --fec mode (off is plain
+retransmission, auto adapts K to the loss rate, a number fixes it) and the
+table shows the wall time, goodput and retransmissions of each run next to
+the speedup over the first mode. Every run must deliver the file intact.
+
+Usage: ./bench_fec.py [--file=2000000] [--pdrop=0.01,0.02,0.05,0.1,0.2]
+    [--fec=off,auto,8] [--mws=20000] [--mss=1000] [--gamma=4] [--seed=50]
+    [--repeat=1] [--timeout=seconds] [--port=number]
+"""
+
+OPTIONS = {
+    "file": "2000000",
+    "pdrop": "0.01,0.02,0.05,0.1,0.2",
+    "fec": "off,auto,8",
+    "mws": 20000,
+    "mss": 1000,
+    "gamma": 4,
+    "seed": 50,
+    "repeat": 1,            # runs per combination, the fastest one is kept
+    "timeout": 120.0,       # seconds a single transfer may take
+    "port": 6400,
+}
+
+def main():
+    msg = "Usage: ./bench_fec.py [--file=name or size] [--pdrop=list] " \
+        "[--fec=list] [--mws=bytes] [--mss=bytes] [--gamma=n] [--seed=n] " \
+        "[--repeat=n] [--timeout=seconds] [--port=number]"
+    options = parseOptions(sys.argv[1:], OPTIONS, msg)
+    # what bench_suite.transfer() reads besides the run itself
+    options.update({"max-order": 4, "max-delay": 200})
+    modes = options["fec"].split(",")
+
+    scratch = tempfile.mkdtemp(prefix="stp-inputs-")
+    failed = 0
+    port = options["port"]
+    print('{:>6}\t{:>6}\t{:>8}\t{:>8}\t{:>6}\t{:>8}\t{:>6}'.format("pdrop", "fec", \
+        "seconds", "MB/s", "rxt", "speedup", "intact"))
+    try:
+        path = inputPath(options["file"], scratch)
+        for pdrop in [float(value) for value in options["pdrop"].split(",")]:
+            run = {"file": options["file"], "mws": options["mws"], \
+                "mss": options["mss"], "gamma": options["gamma"], "pdrop": pdrop, \
+                "pduplicate": 0, "pcorrupt": 0, "porder": 0, "pdelay": 0}
+            reference = None
+            for mode in modes:
+                attempts = []
+                for attempt in range(options["repeat"]):
+                    port = options["port"] + (port + 1 - options["port"]) % 1000
+                    attempts.append(transfer(run, path, port, options, \
+                        ["--fec=" + mode]))
+                # a corrupt attempt is never hidden by a faster good one
+                result = min(attempts, key=lambda result: (result["intact"], \
+                    result["seconds"]))
+                failed += not result["intact"]
+                if(reference is None):
+                    reference = result["seconds"]
+                print('{:>6}\t{:>6}\t{:>8.3f}\t{:>8.2f}\t{:>6}\t{:>7.2f}x\t{:>6}'.format(\
+                    pdrop, mode, result["seconds"], result["goodput"], \
+                    str(result["retransmissions"]), reference / result["seconds"], \
+                    str(result["intact"])))
+    finally:
+        shutil.rmtree(scratch)
+
+    if(failed):
+        print("\n" + str(failed) + " failed")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
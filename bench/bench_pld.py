@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+
+import os, sys, random, tempfile, timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import pld
+
+"""
+Cost of drawing and applying PLD decisions, and checks that the legacy
+generator still makes the choices the original pld() made for a seed and
+that an exported schedule replays unchanged.
+
+Usage: ./bench_pld.py [decisions]
+"""
+
+RATES = (0.1, 0.1, 0.1, 0.1, 0.1)
+MAX_DELAY = 200
+SEED = 50
+
+# the draws the original pld() made for one segment
+def original(pDrop, pDuplicate, pCorrupt, pOrder, pDelay, maxDelay):
+    dropRate = random.random()
+    dupRate = random.random()
+    crptRate = random.random()
+    orderRate = random.random()
+    delayRate = random.random()
+
+    if(dropRate < pDrop):
+        return pld.DROP, 0
+    elif(dupRate < pDuplicate):
+        return pld.DUPLICATE, 0
+    elif(crptRate < pCorrupt):
+        return pld.CORRUPT, 0
+    elif(orderRate < pOrder):
+        return pld.REORDER, 0
+    elif(delayRate < pDelay):
+        return pld.DELAY, random.randint(0, maxDelay)
+    return pld.SEND, 0
+
+def check(count):
+    random.seed(SEED)
+    expected = [original(*RATES, MAX_DELAY) for i in range(count)]
+    schedule = pld.Schedule(*RATES, MAX_DELAY, SEED, "legacy")
+    assert [schedule.next() for i in range(count)] == expected
+
+    file = tempfile.NamedTemporaryFile(suffix=".pld", delete=False)
+    file.close()
+    path = file.name
+    try:
+        schedule.export(path, schedule.position)
+        replay = pld.load(path)
+        assert [replay.next() for i in range(count)] == expected
+        assert replay.next() == (pld.SEND, 0)
+    finally:
+        os.unlink(path)
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    check(10000)
+
+    generators = ["legacy"] + (["numpy"] if pld.numpy is not None else [])
+    print('{:>8}\t{:>14}\t{:>14}'.format("draws", "fill (ns/seg)", "next (ns/seg)"))
+    for generator in generators:
+        fill = min(timeit.repeat(lambda: pld.Schedule(*RATES, MAX_DELAY, SEED, \
+            generator).extend(count), number=1, repeat=3)) / count
+        schedule = pld.Schedule(*RATES, MAX_DELAY, SEED, generator)
+        schedule.extend(count)
+        step = min(timeit.repeat(schedule.next, number=count, repeat=1)) / count
+        print('{:>8}\t{:>14.0f}\t{:>14.0f}'.format(generator, fill * 1e9, step * 1e9))
+
+    # what the five draws per segment cost pld() before
+    random.seed(SEED)
+    inline = min(timeit.repeat(lambda: original(*RATES, MAX_DELAY), number=count, \
+        repeat=3)) / count
+    print('{:>8}\t{:>14}\t{:>14.0f}'.format("pld()", "-", inline * 1e9))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+
+import os, sys, glob, shutil, subprocess, tempfile, time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+from options import parseOptions
+
+"""
+Aggregate throughput of one receiver serving many senders at once.
+
+Every sender transfers the same random file without PLD, each from its own
+directory so their logs stay apart, and every output file is compared
+with the input afterwards.
+
+Usage: ./bench_sessions.py [--senders=1,8,64] [--workers=1] [--size=bytes]
+    [--mws=bytes] [--mss=bytes] [--port=number]
+"""
+
+OPTIONS = {
+    "senders": "1,8,64",
+    "workers": 1,
+    "size": 1000000,
+    "mws": 20000,
+    "mss": 1000,
+    "port": 6100,
+}
+
+def run(count, port, source, options):
+    work = tempfile.mkdtemp(prefix="stp-sessions-")
+    receiver = subprocess.Popen([sys.executable, os.path.join(ROOT, "receiver.py"), \
+        str(port), "out.bin", "--sessions=0", "--workers=" + str(options["workers"])], \
+        cwd=work, stdout=subprocess.DEVNULL)
+    time.sleep(0.5)
+
+    start = time.time()
+    senders = []
+    for i in range(count):
+        home = os.path.join(work, "sender" + str(i))
+        os.mkdir(home)
+        senders.append(subprocess.Popen([sys.executable, \
+            os.path.join(ROOT, "sender.py"), "127.0.0.1", str(port), source, \
+            str(options["mws"]), str(options["mss"]), "4", "0", "0", "0", "0", "4", \
+            "0", "100", "50"], cwd=home, stdout=subprocess.DEVNULL))
+    failed = sum(1 for sender in senders if sender.wait() != 0)
+    elapsed = time.time() - start
+
+    # the last session may still be waiting for its final ACK
+    time.sleep(0.2)
+    receiver.terminate()
+    receiver.wait()
+
+    with open(source, 'rb') as file:
+        expected = file.read()
+    outputs = glob.glob(os.path.join(work, "out.*.bin"))
+    good = 0
+    for path in outputs:
+        with open(path, 'rb') as file:
+            good += file.read() == expected
+    shutil.rmtree(work)
+
+    return elapsed, failed, good
+
+def main():
+    msg = "Usage: ./bench_sessions.py [--senders=1,8,64] [--workers=1] " \
+        "[--size=bytes] [--mws=bytes] [--mss=bytes] [--port=number]"
+    options = parseOptions(sys.argv[1:], OPTIONS, msg)
+    counts = [int(count) for count in options["senders"].split(",")]
+
+    source = tempfile.NamedTemporaryFile(prefix="stp-input-", delete=False)
+    source.write(os.urandom(options["size"]))
+    source.close()
+
+    print('{:>8}\t{:>8}\t{:>10}\t{:>10}\t{:>12}\t{:>8}'.format(\
+        "senders", "workers", "seconds", "MB/s", "MB/s/sender", "intact"))
+    try:
+        for i, count in enumerate(counts):
+            elapsed, failed, good = run(count, options["port"] + i, source.name, \
+                options)
+            total = count * options["size"] / elapsed / 1e6
+            print('{:>8}\t{:>8}\t{:>10.2f}\t{:>10.2f}\t{:>12.3f}\t{:>8}'.format(\
+                count, options["workers"], elapsed, total, total / count, \
+                str(good) + "/" + str(count)))
+    finally:
+        os.unlink(source.name)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+
+import os, sys, re, csv, json, time, random, shutil, signal, itertools, \
+    subprocess, tempfile
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+from options import parseOptions
+
+"""
+Sweeps sender parameters over whole transfers and records how they went.
+
+Every combination of file, MWS, MSS, gamma and PLD probabilities is run
+as a fresh receiver and sender on localhost in a scratch directory. The
+output must match the input byte for byte. For each run the suite keeps
+the wall time and goodput of the sender, its retransmissions (timeouts
+plus fast retransmits from Sender_log.txt) and the CPU time and peak RSS
+of both processes.
+
+Files are names relative to the repository (test0.pdf ...) or sizes in
+bytes, which stand for a generated file of that size (same content for
+the same size). Every sweep option takes a comma separated list.
+
+Results go to --csv and --json. A --baseline is a JSON file from an
+earlier run: runs with the same parameters are compared and any whose
+goodput fell, or whose CPU time grew, by more than --tolerance count as
+a regression. The exit status is 1 if a run failed, produced a corrupt
+file or regressed.
+
+Usage: ./bench_suite.py [--files=test0.pdf,test1.pdf,test2.pdf,2000000]
+    [--mws=6000,20000] [--mss=1000] [--gamma=4] [--pdrop=0,0.05]
+    [--pduplicate=0] [--pcorrupt=0] [--porder=0] [--pdelay=0]
+    [--max-order=4] [--max-delay=200] [--seed=50] [--repeat=1]
+    [--csv=file] [--json=file] [--baseline=file] [--tolerance=0.1]
+    [--timeout=seconds] [--port=number]
+"""
+
+OPTIONS = {
+    "files": "test0.pdf,test1.pdf,test2.pdf,2000000",
+    "mws": "6000,20000",
+    "mss": "1000",
+    "gamma": "4",
+    "pdrop": "0,0.05",
+    "pduplicate": "0",
+    "pcorrupt": "0",
+    "porder": "0",
+    "pdelay": "0",
+    "max-order": 4,
+    "max-delay": 200,
+    "seed": 50,
+    "repeat": 1,            # runs per combination, the fastest one is kept
+    "csv": "",
+    "json": "",
+    "baseline": "",
+    "tolerance": 0.1,       # relative change that counts as a regression
+    "timeout": 120.0,       # seconds a single transfer may take
+    "port": 6200,
+}
+
+# the parameters that identify a run, in the order they are swept
+SWEEP = ("file", "mws", "mss", "gamma", "pdrop", "pduplicate", "pcorrupt", \
+    "porder", "pdelay")
+
+FIELDS = SWEEP + ("size", "seconds", "goodput", "retransmissions", \
+    "sender_cpu", "receiver_cpu", "sender_rss", "receiver_rss", "intact")
+
+# a retransmission is a timeout or a fast retransmit in the sender's summary
+RETRANSMITS = re.compile(r"(?:Retransmissions due to TIMEOUT|FAST RETRANSMISION)\s+(\d+)")
+
+# exit code, CPU seconds and peak RSS (KB) of a child, killed after deadline
+def reap(process, deadline):
+    while True:
+        pid, status, usage = os.wait4(process.pid, os.WNOHANG)
+        if(pid):
+            break
+        if(time.time() > deadline):
+            process.send_signal(signal.SIGKILL)
+            pid, status, usage = os.wait4(process.pid, 0)
+            break
+        time.sleep(0.005)
+    # os.wait4 reaped it behind Popen's back
+    process.returncode = os.waitstatus_to_exitcode(status)
+
+    return process.returncode, usage.ru_utime + usage.ru_stime, usage.ru_maxrss
+
+# extra are sender options beyond the positional ones
+def transfer(run, path, port, options, extra=()):
+    work = tempfile.mkdtemp(prefix="stp-suite-")
+    try:
+        receiver = subprocess.Popen([sys.executable, os.path.join(ROOT, "receiver.py"), \
+            str(port), "out.bin"], cwd=work, stdout=subprocess.DEVNULL)
+        time.sleep(0.3)
+
+        start = time.time()
+        sender = subprocess.Popen([sys.executable, os.path.join(ROOT, "sender.py"), \
+            "127.0.0.1", str(port), path, str(run["mws"]), str(run["mss"]), \
+            str(run["gamma"]), str(run["pdrop"]), str(run["pduplicate"]), \
+            str(run["pcorrupt"]), str(run["porder"]), str(options["max-order"]), \
+            str(run["pdelay"]), str(options["max-delay"]), str(options["seed"])] + \
+            list(extra), \
+            cwd=work, stdout=subprocess.DEVNULL)
+        deadline = start + options["timeout"]
+        senderCode, senderCpu, senderRss = reap(sender, deadline)
+        seconds = time.time() - start
+        # the receiver only exits once it has seen the final ACK
+        receiverCode, receiverCpu, receiverRss = reap(receiver, \
+            max(deadline, time.time() + 2))
+
+        retransmissions = None
+        log = os.path.join(work, "Sender_log.txt")
+        if(os.path.exists(log)):
+            with open(log) as file:
+                retransmissions = sum(int(count) for count in \
+                    RETRANSMITS.findall(file.read()))
+
+        output = os.path.join(work, "out.bin")
+        intact = senderCode == 0 and receiverCode == 0 and \
+            os.path.exists(output) and sameContent(path, output)
+    finally:
+        shutil.rmtree(work)
+
+    size = os.path.getsize(path)
+    return dict(run, size=size, seconds=round(seconds, 4), \
+        goodput=round(size / seconds / 1e6, 4) if seconds else 0, \
+        retransmissions=retransmissions, sender_cpu=round(senderCpu, 4), \
+        receiver_cpu=round(receiverCpu, 4), sender_rss=senderRss, \
+        receiver_rss=receiverRss, intact=intact)
+
+def sameContent(first, second):
+    with open(first, 'rb') as a, open(second, 'rb') as b:
+        while True:
+            chunk = a.read(1 << 20)
+            if(chunk != b.read(1 << 20)):
+                return False
+            if(not chunk):
+                return True
+
+# the path for a file entry, generating the ones given as a size
+def inputPath(name, scratch):
+    if(not name.isdigit()):
+        return os.path.join(ROOT, name)
+
+    path = os.path.join(scratch, "generated-" + name + ".bin")
+    if(not os.path.exists(path)):
+        with open(path, 'wb') as file:
+            file.write(random.Random(int(name)).randbytes(int(name)))
+    return path
+
+def sweep(options):
+    values = [options[name + "s"].split(",") if name == "file" else \
+        [float(value) if "." in value else int(value) for value in \
+        options[name].split(",")] for name in SWEEP]
+
+    return [dict(zip(SWEEP, combination)) for combination in itertools.product(*values)]
+
+def key(run):
+    return tuple(str(run[name]) for name in SWEEP)
+
+# rows of runs that got slower or more expensive than in baseline
+def compare(results, baseline, tolerance):
+    previous = {key(run): run for run in baseline}
+    regressions = []
+    print('\n{:>12}\t{:>8}\t{:>8}\t{:>10}\t{:>10}\t{:>8}'.format("file", "mws", \
+        "pdrop", "goodput", "baseline", "change"))
+    for run in results:
+        old = previous.get(key(run))
+        if(old is None or not old["goodput"]):
+            continue
+        change = run["goodput"] / old["goodput"] - 1
+        slower = change < -tolerance
+        costlier = old["sender_cpu"] and \
+            run["sender_cpu"] / old["sender_cpu"] - 1 > tolerance
+        if(slower or costlier):
+            regressions.append(run)
+        print('{:>12}\t{:>8}\t{:>8}\t{:>10.2f}\t{:>10.2f}\t{:>+7.1%}{}'.format(\
+            run["file"], run["mws"], run["pdrop"], run["goodput"], old["goodput"], \
+            change, "  REGRESSION" if slower or costlier else ""))
+
+    return regressions
+
+def main():
+    msg = "Usage: ./bench_suite.py [--files=names or sizes] [--mws=list] " \
+        "[--mss=list] [--gamma=list] [--pdrop=list] [--pduplicate=list] " \
+        "[--pcorrupt=list] [--porder=list] [--pdelay=list] [--max-order=n] " \
+        "[--max-delay=ms] [--seed=n] [--repeat=n] [--csv=file] [--json=file] " \
+        "[--baseline=file] [--tolerance=fraction] [--timeout=seconds] " \
+        "[--port=number]"
+    options = parseOptions(sys.argv[1:], OPTIONS, msg)
+    runs = sweep(options)
+
+    scratch = tempfile.mkdtemp(prefix="stp-inputs-")
+    results = []
+    print('{:>12}\t{:>6}\t{:>5}\t{:>5}\t{:>6}\t{:>8}\t{:>8}\t{:>6}\t{:>8}\t{:>8}\t{:>6}'.format(\
+        "file", "mws", "mss", "gamma", "pdrop", "seconds", "MB/s", "rxt", \
+        "cpu (s)", "rss (KB)", "intact"))
+    try:
+        for i, run in enumerate(runs):
+            path = inputPath(run["file"], scratch)
+            attempts = [transfer(run, path, options["port"] + (i * options["repeat"] + \
+                attempt) % 1000, options) for attempt in range(options["repeat"])]
+            # a corrupt attempt is never hidden by a faster good one
+            result = min(attempts, key=lambda result: (result["intact"], \
+                result["seconds"]))
+            results.append(result)
+            print('{:>12}\t{:>6}\t{:>5}\t{:>5}\t{:>6}\t{:>8.3f}\t{:>8.2f}\t{:>6}\t{:>8.3f}\t{:>8}\t{:>6}'.format(\
+                result["file"], result["mws"], result["mss"], result["gamma"], \
+                result["pdrop"], result["seconds"], result["goodput"], \
+                str(result["retransmissions"]), result["sender_cpu"], \
+                result["sender_rss"], str(result["intact"])))
+    finally:
+        shutil.rmtree(scratch)
+
+    if(options["csv"]):
+        with open(options["csv"], 'w', newline='') as file:
+            writer = csv.DictWriter(file, FIELDS)
+            writer.writeheader()
+            writer.writerows(results)
+    if(options["json"]):
+        with open(options["json"], 'w') as file:
+            json.dump(results, file, indent=1)
+
+    failed = [run for run in results if not run["intact"]]
+    regressions = []
+    if(options["baseline"]):
+        with open(options["baseline"]) as file:
+            regressions = compare(results, json.load(file), options["tolerance"])
+
+    if(failed or regressions):
+        print("\n" + str(len(failed)) + " failed, " + str(len(regressions)) + \
+            " regressed")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+
+import os, sys, pickle, timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import wire
+
+"""
+Compares the binary wire format against the original pickled lists.
+
+Data segments carry a timestamp and ACKs echo it, as they do in a transfer
+(the pickled lists have no room for one). Binary data is decoded from a
+memoryview over a receive buffer, the way the receiver reads it.
+
+Usage: ./bench_wire.py [MSS ...]
+"""
+
+def pickleEncode(packet):
+    return pickle.dumps(packet)
+
+def pickleDecode(data):
+    return pickle.loads(data)
+
+STAMP = wire.timestamp(wire.stamp(1.5), 12345)
+
+def binaryEncode(packet):
+    if(len(packet) == 3):
+        return wire.encode(packet, options=STAMP)
+    return wire.encode(packet, wire.VERSION, 7, 0, STAMP)
+
+def binaryDecode(data):
+    return wire.decode(data)[0]
+
+# the datagram as a receive buffer holds it
+def received(parts):
+    data = b"".join(parts) if isinstance(parts, tuple) else parts
+    buffer = memoryview(bytearray(65536))
+    buffer[:len(data)] = data
+    return buffer[:len(data)]
+
+def bench(name, encode, decode, packet, number):
+    data = encode(packet)
+    if(name == "binary"):
+        data = received(data)
+    if(len(packet) == 6):
+        assert bytes(decode(data)[5]) == packet[5]
+
+    encTime = min(timeit.repeat(lambda: encode(packet), number=number)) / number
+    decTime = min(timeit.repeat(lambda: decode(data), number=number)) / number
+    size = len(packet[5]) if len(packet) == 6 else 0
+    overhead = len(data) - size
+
+    print('{:>8}\t{:>8}\t{:>8}\t{:>8}\t{:>10.2f}\t{:>10.2f}'.format(\
+        name, size, len(data), overhead, encTime * 1e6, decTime * 1e6))
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [150, 1000, 4000, 60000]
+    number = 50000
+
+    print('{:>8}\t{:>8}\t{:>8}\t{:>8}\t{:>10}\t{:>10}'.format(\
+        "format", "MSS", "bytes", "header", "enc (us)", "dec (us)"))
+    for size in sizes:
+        packet = ["Psh", size, 0x1234, 123456789, 1, os.urandom(size)]
+        bench("pickle", pickleEncode, pickleDecode, packet, number)
+        bench("binary", binaryEncode, binaryDecode, packet, number)
+
+    ack = ["Ack", 1, 123456789]
+    bench("pickle", pickleEncode, pickleDecode, ack, number)
+    bench("binary", binaryEncode, binaryDecode, ack, number)
+
+if __name__ == "__main__":
+    main()
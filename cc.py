@@ -0,0 +1,174 @@
+import time
+
+"""
+Congestion control for the sender
+
+Every algorithm keeps cwnd and ssthresh in bytes and is driven by three
+events: onAck (the cumulative ack moved forward), onLoss (fast retransmit
+or a SACK hole) and onTimeout. The sender never has more than
+min(cwnd, MWS) bytes in flight.
+
+    fixed    - the old behaviour, the window is always MWS
+    reno     - slow start, congestion avoidance, halve on every loss
+    newreno  - reno that halves once per window of data (RFC 6582)
+    cubic    - cubic window growth (RFC 8312) with newreno style recovery
+
+A trace of every change (time, cwnd, ssthresh, bytes in flight) can be
+written to a file so algorithms can be compared on the same PLD seed.
+"""
+
+# initial window in segments (RFC 6928)
+INITIAL_WINDOW = 10
+
+class CongestionControl:
+    name = None
+
+    def __init__(self, mss, maxWindow, trace=None, start=None):
+        self.mss = mss
+        self.maxWindow = maxWindow
+        self.cwnd = min(INITIAL_WINDOW * mss, maxWindow)
+        self.ssthresh = maxWindow
+        self.trace = trace
+        self.start = start if start is not None else time.time()
+        self.log(0)
+
+    def window(self):
+        return max(self.mss, min(self.cwnd, self.maxWindow))
+
+    def onAck(self, acked, ack, inFlight, rtt=None):
+        if(self.cwnd < self.ssthresh):
+            # slow start, grow by what was acked (RFC 3465)
+            self.cwnd += min(acked, 2 * self.mss)
+        else:
+            self.cwnd += self.mss * acked / self.cwnd
+        self.cwnd = min(self.cwnd, self.maxWindow)
+        self.log(inFlight)
+
+    def onLoss(self, inFlight, highestSent):
+        self.ssthresh = max(inFlight / 2, 2 * self.mss)
+        self.cwnd = self.ssthresh
+        self.log(inFlight)
+
+    def onTimeout(self, inFlight, highestSent):
+        self.ssthresh = max(inFlight / 2, 2 * self.mss)
+        self.cwnd = self.mss
+        self.log(inFlight)
+
+    def log(self, inFlight):
+        if(self.trace is not None):
+            self.trace.write('{:.4f}\t{}\t{}\t{}\t{}\n'.format(time.time() - self.start, \
+                self.name, int(self.cwnd), int(self.ssthresh), inFlight))
+
+class Fixed(CongestionControl):
+    name = "fixed"
+
+    def __init__(self, mss, maxWindow, trace=None, start=None):
+        super().__init__(mss, maxWindow, trace, start)
+        self.cwnd = maxWindow
+
+    def onAck(self, acked, ack, inFlight, rtt=None):
+        pass
+
+    def onLoss(self, inFlight, highestSent):
+        pass
+
+    def onTimeout(self, inFlight, highestSent):
+        pass
+
+class Reno(CongestionControl):
+    name = "reno"
+
+class NewReno(CongestionControl):
+    name = "newreno"
+
+    def __init__(self, mss, maxWindow, trace=None, start=None):
+        super().__init__(mss, maxWindow, trace, start)
+        self.recover = 0
+
+    def onAck(self, acked, ack, inFlight, rtt=None):
+        # no growth until the data outstanding at the loss is acked
+        if(ack <= self.recover):
+            return
+        super().onAck(acked, ack, inFlight, rtt)
+
+    def onLoss(self, inFlight, highestSent):
+        if(highestSent <= self.recover):
+            return
+        self.recover = highestSent
+        super().onLoss(inFlight, highestSent)
+
+    def onTimeout(self, inFlight, highestSent):
+        self.recover = highestSent
+        super().onTimeout(inFlight, highestSent)
+
+class Cubic(NewReno):
+    name = "cubic"
+
+    C = 0.4
+    BETA = 0.7
+
+    def __init__(self, mss, maxWindow, trace=None, start=None):
+        super().__init__(mss, maxWindow, trace, start)
+        self.wMax = 0
+        self.k = 0
+        self.epoch = None
+        self.renoCwnd = self.cwnd
+
+    def onAck(self, acked, ack, inFlight, rtt=None):
+        if(ack <= self.recover):
+            return
+        if(self.cwnd < self.ssthresh):
+            CongestionControl.onAck(self, acked, ack, inFlight, rtt)
+            return
+
+        now = time.monotonic()
+        if(self.epoch is None):
+            self.epoch = now
+            self.renoCwnd = self.cwnd
+            if(self.cwnd < self.wMax):
+                self.k = ((self.wMax - self.cwnd) / self.mss / self.C) ** (1 / 3)
+            else:
+                self.k = 0
+                self.wMax = self.cwnd
+
+        # where the cubic curve will be one RTT from now
+        t = now - self.epoch + (rtt or 0)
+        target = self.wMax + self.C * (t - self.k) ** 3 * self.mss
+
+        # never grow slower than reno would in the same time
+        self.renoCwnd += self.mss * 3 * (1 - self.BETA) / (1 + self.BETA) * \
+            acked / self.cwnd
+        target = max(target, self.renoCwnd)
+
+        if(target > self.cwnd):
+            self.cwnd += (target - self.cwnd) * acked / self.cwnd
+        self.cwnd = min(self.cwnd, self.maxWindow)
+        self.log(inFlight)
+
+    def onLoss(self, inFlight, highestSent):
+        if(highestSent <= self.recover):
+            return
+        self.recover = highestSent
+        self.reduce()
+        self.cwnd = self.ssthresh
+        self.log(inFlight)
+
+    def onTimeout(self, inFlight, highestSent):
+        self.recover = highestSent
+        self.reduce()
+        self.cwnd = self.mss
+        self.log(inFlight)
+
+    def reduce(self):
+        self.epoch = None
+        self.wMax = self.cwnd
+        self.ssthresh = max(self.cwnd * self.BETA, 2 * self.mss)
+
+ALGORITHMS = {cls.name: cls for cls in (Fixed, Reno, NewReno, Cubic)}
+
+def create(name, mss, maxWindow, trace=None, start=None):
+    if(name not in ALGORITHMS):
+        raise ValueError("unknown congestion control " + name + \
+            ", pick one of " + ", ".join(ALGORITHMS))
+
+    return ALGORITHMS[name](mss, maxWindow, trace, start)
@@ -0,0 +1,39 @@
+import sys
+from array import array
+
+"""
+16-bit checksum shared by sender.py and receiver.py
+
+The value on the wire is the original one: the plain sum of the
+little-endian 16-bit words of the payload (an odd trailing byte counts as
+its own word), folded once and complemented. It has to stay bit for bit the
+same so old peers keep accepting our segments.
+
+The sum itself runs in C over an array of words.
+"""
+
+SWAP = sys.byteorder != "little"
+
+def checkSum(msg):
+    view = memoryview(msg)
+    length = len(view)
+    words = array("H")
+    words.frombytes(view[:length & ~1])
+    if(SWAP):
+        words.byteswap()
+
+    s = sum(words)
+    if(length & 1):
+        s += view[length - 1]
+
+    s += (s >> 16)
+    return ~s & 0xffff
+
+# flip the leading bit of a checksum, 0 means "no checksum" on the wire so
+# a corrupted value never becomes 0
+def corrupt(sum):
+    if(sum == 0):
+        return 1
+
+    sum ^= 1 << (sum.bit_length() - 1)
+    return sum or 0xffff
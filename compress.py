@@ -0,0 +1,194 @@
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import lz4.block
+except ImportError:
+    lz4 = None
+
+"""
+Payload compression for data segments
+
+The sender offers the codecs it can use in its Syn and the receiver picks
+the first one it knows in the Synack, so an old receiver simply never sees
+a compressed segment. Every segment is compressed on its own, a compressed
+one is flagged in the header and still covers length bytes of sequence
+space, and the checksum is taken over what goes on the wire.
+
+Pipeline reads the file ahead of the send loop and compresses up to depth
+segments in a thread pool (zlib and lz4 let go of the GIL while they
+work), so the loop only waits when it has caught up with the workers.
+
+Compressing a PDF's images or a zip gains nothing, so Adaptive keeps track
+of what compression achieved: a segment that doesn't shrink below WORTH of
+its size goes out raw, and after GIVE_UP of those in a row only one
+segment in SAMPLE_EVERY is tried until one is worth it again.
+
+Byte ranges the receiver already holds from an earlier attempt (held, see
+manifest.py) are skipped and no chunk reaches into one, which is why
+read() also says where in the file each payload starts.
+"""
+
+ZLIB = 1
+LZ4 = 2
+
+WORTH = 0.9
+GIVE_UP = 4
+SAMPLE_EVERY = 16
+
+class Codec:
+    def __init__(self, id, name, compress, decompress, error):
+        self.id = id
+        self.name = name
+        # compress(data, level), decompress(data, size) of at most size bytes
+        self.compress = compress
+        self.decompress = decompress
+        # what decompress raises for data it can't make sense of
+        self.error = error
+
+    # the size bytes data was compressed from, ValueError for anything else
+    def expand(self, data, size):
+        try:
+            data = self.decompress(data, size)
+        except self.error as error:
+            raise ValueError(self.name + ": " + str(error))
+        if(len(data) != size):
+            raise ValueError(self.name + ": " + str(len(data)) + " bytes instead of " + \
+                str(size))
+
+        return data
+
+CODECS = {
+    ZLIB: Codec(ZLIB, "zlib", lambda data, level: zlib.compress(data, level), \
+        # a max_length of 0 would mean no limit at all
+        lambda data, size: zlib.decompressobj().decompress(data, size or 1), zlib.error),
+}
+if(lz4 is not None):
+    CODECS[LZ4] = Codec(LZ4, "lz4", \
+        lambda data, level: lz4.block.compress(data, store_size=False), \
+        lambda data, size: lz4.block.decompress(data, uncompressed_size=size), \
+        lz4.block.LZ4BlockError)
+
+# codec ids for a --compress value, fastest first for auto
+def offer(name):
+    if(name == "off"):
+        return []
+    if(name == "auto"):
+        return [id for id in (LZ4, ZLIB) if id in CODECS]
+    for codec in CODECS.values():
+        if(codec.name == name):
+            return [codec.id]
+
+    raise ValueError("unknown or unavailable codec " + name)
+
+# the first codec offered that we know, None if there is none
+def choose(ids):
+    for id in ids:
+        if(id in CODECS):
+            return CODECS[id]
+
+    return None
+
+class Adaptive:
+    def __init__(self):
+        self.misses = 0
+        self.skipped = 0
+
+    def shouldTry(self):
+        if(self.misses < GIVE_UP):
+            return True
+        self.skipped += 1
+        if(self.skipped >= SAMPLE_EVERY):
+            self.skipped = 0
+            return True
+
+        return False
+
+    def record(self, worth):
+        self.misses = 0 if worth else self.misses + 1
+
+class Pipeline:
+    def __init__(self, source, MSS, codec=None, level=1, workers=2, depth=32, \
+            held=()):
+        self.source = source
+        self.held = deque(sorted(held))
+        self.MSS = MSS
+        self.codec = codec
+        self.level = level
+        self.depth = depth
+        self.pool = ThreadPoolExecutor(workers) if codec is not None else None
+        self.adaptive = Adaptive()
+        # (position, chunk, future or None when it isn't tried) in file order
+        self.pending = deque()
+        self.done = False
+        # the file's bytes behind the last payload read
+        self.raw = b""
+
+        self.rawBytes = 0
+        self.wireBytes = 0
+        self.tried = 0
+        self.compressed = 0
+
+    # the next payload to send, how many bytes of the file it covers and
+    # where they start, an empty payload at the end
+    def read(self):
+        if(self.codec is None):
+            position, chunk = self.next()
+            self.raw = chunk
+            self.rawBytes += len(chunk)
+            self.wireBytes += len(chunk)
+            return chunk, len(chunk), position
+
+        self.fill()
+        if(not self.pending):
+            return b"", 0, self.source.position
+
+        position, chunk, future = self.pending.popleft()
+        self.raw = payload = chunk
+        if(future is not None):
+            result = future.result()
+            worth = len(result) <= WORTH * len(chunk)
+            self.adaptive.record(worth)
+            if(worth):
+                payload = result
+                self.compressed += 1
+        self.rawBytes += len(chunk)
+        self.wireBytes += len(payload)
+        self.fill()
+
+        return payload, len(chunk), position
+
+    # the next chunk of the source outside the held ranges and its position
+    def next(self):
+        held = self.held
+        position = self.source.position
+        while(held and held[0][1] <= position):
+            held.popleft()
+        if(held and held[0][0] <= position):
+            self.source.skip(held[0][1] - position)
+            position = self.source.position
+            held.popleft()
+
+        length = self.MSS
+        if(held):
+            length = min(length, held[0][0] - position)
+        return position, self.source.read(length)
+
+    def fill(self):
+        pending = self.pending
+        while(not self.done and len(pending) < self.depth):
+            position, chunk = self.next()
+            if(not chunk):
+                self.done = True
+                break
+            future = None
+            if(self.adaptive.shouldTry()):
+                future = self.pool.submit(self.codec.compress, chunk, self.level)
+                self.tried += 1
+            pending.append((position, chunk, future))
+
+    def close(self):
+        if(self.pool is not None):
+            self.pool.shutdown(cancel_futures=True)
+        self.pending.clear()
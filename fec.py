@@ -0,0 +1,126 @@
+import struct
+
+"""
+Forward error correction with XOR parity
+
+After every K data segments the sender sends one Fec segment carrying the
+(seq, length) of each of them and the XOR of their data, shorter segments
+padded with zeros. A receiver missing exactly one segment of the block
+XORs the parity with the others (already on disk) and gets the lost one
+back without waiting for a retransmission, and says so in the ACK it sends
+for it. Two losses in one block still need the sender.
+
+The parity is taken over the file's bytes, not what goes on the wire, so
+it works the same with compressed payloads.
+
+K follows the loss rate: every PERIOD segments the sender looks at how
+many segments it had to resend plus how many the receiver rebuilt, and
+picks K so that one block of K + 1 segments loses about half a segment on
+average (within [MIN_K, MAX_K]). Below QUIET no parity is sent at all.
+
+    payload  count entries    parity
+               H   (Q I) each
+"""
+
+COUNT = struct.Struct("!H")
+ENTRY = struct.Struct("!QI")
+
+MIN_K = 2
+MAX_K = 32
+START_K = 8
+QUIET = 0.002
+PERIOD = 64
+SMOOTHING = 0.25
+
+# what a repair segment needs beyond the largest payload it covers
+HEADROOM = COUNT.size + MAX_K * ENTRY.size
+
+def encode(entries, parity):
+    return COUNT.pack(len(entries)) + \
+        b"".join(ENTRY.pack(seq, length) for seq, length in entries) + parity
+
+# the (seq, length) entries of a repair segment and its parity
+def decode(payload):
+    count = COUNT.unpack_from(payload)[0]
+    offset = COUNT.size + count * ENTRY.size
+    if(not count or len(payload) <= offset):
+        raise ValueError("repair segment of " + str(len(payload)) + " bytes for " + \
+            str(count) + " entries")
+    entries = [ENTRY.unpack_from(payload, COUNT.size + i * ENTRY.size) \
+        for i in range(count)]
+
+    return entries, payload[offset:]
+
+# the missing segment of length bytes from the parity and all the others
+def rebuild(parity, others, length):
+    value = int.from_bytes(parity, "little")
+    for data in others:
+        value ^= int.from_bytes(data, "little")
+
+    return value.to_bytes(len(parity), "little")[:length]
+
+class Encoder:
+    # K is fixed unless it is 0, losses() counts the segments resent so far
+    def __init__(self, K=0, losses=lambda: 0):
+        self.fixed = K
+        self.K = K or START_K
+        self.losses = losses
+        self.rate = 0.0
+        # segments the receiver rebuilt, and losses seen at the last update
+        self.recovered = 0
+        self.counted = 0
+        self.sent = 0
+
+        # the block being built, the parity kept as one big integer
+        self.entries = []
+        self.parity = 0
+        self.size = 0
+        self.repairs = 0
+
+    # (seq of the block's first segment, repair payload) once data completes
+    # a block, else None
+    def add(self, seq, length, data):
+        self.sent += 1
+        if(self.sent >= PERIOD):
+            self.adapt()
+        if(not self.K):
+            return self.flush()
+
+        self.entries.append((seq, length))
+        self.parity ^= int.from_bytes(data, "little")
+        self.size = max(self.size, len(data))
+        if(len(self.entries) >= self.K):
+            return self.flush()
+
+        return None
+
+    # the same for a partial block, None if there is none
+    def flush(self):
+        if(not self.entries):
+            return None
+
+        first = self.entries[0][0]
+        payload = encode(self.entries, self.parity.to_bytes(self.size, "little"))
+        self.entries = []
+        self.parity = 0
+        self.size = 0
+        self.repairs += 1
+        return first, payload
+
+    # the receiver's count of rebuilt segments, ACKs may arrive out of order
+    def report(self, recovered):
+        self.recovered = max(self.recovered, recovered)
+
+    def adapt(self):
+        lost = self.losses() + self.recovered
+        sample = (lost - self.counted) / self.sent
+        self.counted = lost
+        self.sent = 0
+        self.rate += SMOOTHING * (sample - self.rate)
+        if(self.fixed):
+            return
+
+        if(self.rate < QUIET):
+            self.K = 0
+        else:
+            self.K = max(MIN_K, min(MAX_K, int(1 / (2 * self.rate))))
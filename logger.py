@@ -0,0 +1,131 @@
+import struct, threading, time
+from collections import deque
+
+"""
+Buffered event log for Sender_log.txt / Receiver_log.txt
+
+One handle stays open for the whole run. record() only appends a tuple to
+an in-memory batch, a background thread formats and writes the batch once
+it holds maxRecords entries or interval seconds have passed. Text mode
+produces exactly the tab padded lines logTime() always wrote; binary mode
+writes fixed size EVENT records instead, with free text (the final stats)
+stored as TEXT records.
+"""
+
+LINE = '{:>10}\t\t{:>10}\t\t{:>10}\t\t{:>10}\t\t{:>10}\t\t{:>10}\n'
+
+# binary records: kind, then either an event or a length prefixed text
+EVENT = struct.Struct("!BdBBQIQ")
+TEXT = struct.Struct("!BI")
+KIND_EVENT = 1
+KIND_TEXT = 2
+
+EVENTS = ["snd", "rcv", "drop", "snd/dup", "snd/corr", "snd/rord", \
+    "snd/dely", "snd/RXT", "rcv/DA", "snd/DA", "rcv/corr", "rcv/fec"]
+# R is a repair segment, see fec.py
+SYMBOLS = ["S", "SA", "A", "D", "F", "R"]
+EVENT_CODES = {name: code for code, name in enumerate(EVENTS)}
+SYMBOL_CODES = {name: code for code, name in enumerate(SYMBOLS)}
+
+class EventLog:
+    def __init__(self, path, start, binary=False, maxRecords=4096, interval=0.5):
+        self.file = open(path, 'ab' if binary else 'a')
+        self.start = start
+        self.binary = binary
+        self.maxRecords = maxRecords
+        self.interval = interval
+        self.records = deque()
+        self.closed = False
+        self.lock = threading.Lock()
+        self.wakeup = threading.Condition(self.lock)
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def record(self, packet, type, symbol):
+        # same fields logTime() picked out: short ACKs carry no size
+        if(len(packet) == 3):
+            entry = (time.time(), type, symbol, packet[1], 0, packet[2])
+        else:
+            entry = (time.time(), type, symbol, packet[3], packet[1], packet[4])
+
+        self.records.append(entry)
+        if(len(self.records) >= self.maxRecords):
+            with self.lock:
+                self.wakeup.notify()
+
+    def write(self, text):
+        # free text goes after every event recorded so far
+        self.flush()
+        with self.lock:
+            if(self.binary):
+                data = text.encode()
+                self.file.write(TEXT.pack(KIND_TEXT, len(data)) + data)
+            else:
+                self.file.write(text)
+            self.file.flush()
+
+    def flush(self):
+        with self.lock:
+            self.drain()
+
+    def close(self):
+        with self.lock:
+            self.closed = True
+            self.wakeup.notify()
+        self.thread.join()
+        self.file.close()
+
+    def run(self):
+        with self.lock:
+            while(not self.closed):
+                self.wakeup.wait(self.interval)
+                self.drain()
+
+    # caller holds the lock
+    def drain(self):
+        # deque appends and pops are atomic, so record() never needs the lock
+        popleft = self.records.popleft
+        records = [popleft() for i in range(len(self.records))]
+        if(not records):
+            return
+
+        if(self.binary):
+            self.file.write(b"".join(self.pack(entry) for entry in records))
+        else:
+            self.file.write("".join(self.format(entry) for entry in records))
+        self.file.flush()
+
+    def format(self, entry):
+        when, type, symbol, seq, size, ack = entry
+        return LINE.format(type, round(when - self.start, 2), symbol, seq, size, ack)
+
+    def pack(self, entry):
+        when, type, symbol, seq, size, ack = entry
+        return EVENT.pack(KIND_EVENT, when - self.start, EVENT_CODES[type], \
+            SYMBOL_CODES[symbol], seq, size, ack)
+
+# stands in for an EventLog when no log is wanted
+class NullLog:
+    def record(self, packet, type, symbol):
+        pass
+
+    def write(self, text):
+        pass
+
+    def close(self):
+        pass
+
+# yields ("event", (time, type, symbol, seq, size, ack)) or ("text", str)
+# for every record of a binary log
+def readBinary(file):
+    while True:
+        head = file.read(1)
+        if(not head):
+            return
+        if(head[0] == KIND_TEXT):
+            length = TEXT.unpack(head + file.read(TEXT.size - 1))[1]
+            yield "text", file.read(length).decode()
+        else:
+            fields = EVENT.unpack(head + file.read(EVENT.size - 1))
+            yield "event", (fields[1], EVENTS[fields[2]], SYMBOLS[fields[3]], \
+                fields[4], fields[5], fields[6])
@@ -0,0 +1,135 @@
+import os, struct, hashlib
+
+"""
+On-disk record of what a resumable transfer has received
+
+The receiver keeps a manifest next to the output file: the key naming the
+transfer, the [start, end) byte ranges already written and a blake2b
+digest of every whole BLOCK inside them. It is rewritten every few seconds
+(after the output file is synced, so nothing it claims can be lost) by
+writing a temporary file and renaming it over the old one, and removed
+once the transfer completes.
+
+When a sender comes back with the same key, verify() re-reads every hashed
+block and forgets any that no longer matches, the rest is reported to the
+sender in the Synack and never sent again.
+
+The key is a digest of the file's name, size and modification time, so a
+changed file starts over instead of being patched with stale ranges.
+
+    header  magic version key    block ranges hashes
+             4s     B     16s      I     I      I
+    ranges  start end (Q Q) each
+    hashes  block index (I) and digest (16s) each
+"""
+
+MAGIC = b"STPM"
+VERSION = 1
+HEADER = struct.Struct("!4sB16sIII")
+RANGE = struct.Struct("!QQ")
+HASH = struct.Struct("!I16s")
+DIGEST_SIZE = 16
+
+BLOCK = 1 << 20
+
+def digest(data):
+    return hashlib.blake2b(data, digest_size=DIGEST_SIZE).digest()
+
+def resumeKey(path):
+    info = os.stat(path)
+    name = os.path.basename(path) + "\0" + str(info.st_size) + "\0" + \
+        str(info.st_mtime_ns)
+
+    return hashlib.blake2b(name.encode(), digest_size=DIGEST_SIZE).digest()
+
+class Manifest:
+    def __init__(self, path, key, block=BLOCK):
+        self.path = path
+        self.key = key
+        self.block = block
+        # merged [start, end) byte ranges on disk, and digests by block
+        self.ranges = []
+        self.hashes = {}
+
+    def held(self):
+        return sum(end - start for start, end in self.ranges)
+
+    # hashes the blocks the ranges newly cover, syncs fd (the output file)
+    # and replaces the manifest on disk
+    def save(self, ranges, fd):
+        self.ranges = ranges
+        block = self.block
+        for start, end in ranges:
+            for index in range(-(-start // block), end // block):
+                if(index not in self.hashes):
+                    self.hashes[index] = digest(os.pread(fd, block, index * block))
+        os.fdatasync(fd)
+
+        temporary = self.path + ".tmp"
+        with open(temporary, 'wb') as file:
+            file.write(HEADER.pack(MAGIC, VERSION, self.key, block, \
+                len(self.ranges), len(self.hashes)))
+            file.write(b"".join(RANGE.pack(start, end) for start, end in self.ranges))
+            file.write(b"".join(HASH.pack(index, value) for index, value in \
+                sorted(self.hashes.items())))
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temporary, self.path)
+
+    # drops every hashed block whose data no longer matches, returns how
+    # many bytes that was
+    def verify(self, fd):
+        dropped = 0
+        for index, value in list(self.hashes.items()):
+            start = index * self.block
+            if(digest(os.pread(fd, self.block, start)) != value):
+                del self.hashes[index]
+                self.ranges = subtract(self.ranges, start, start + self.block)
+                dropped += self.block
+
+        return dropped
+
+    def remove(self):
+        if(os.path.exists(self.path)):
+            os.unlink(self.path)
+
+# the manifest at path if it exists, is intact and names key, else None
+def load(path, key):
+    try:
+        with open(path, 'rb') as file:
+            data = file.read()
+    except FileNotFoundError:
+        return None
+
+    try:
+        magic, version, stored, block, rangeCount, hashCount = \
+            HEADER.unpack_from(data)
+        if(magic != MAGIC or version != VERSION or stored != key):
+            return None
+        offset = HEADER.size
+        record = Manifest(path, key, block)
+        for i in range(rangeCount):
+            record.ranges.append(list(RANGE.unpack_from(data, offset)))
+            offset += RANGE.size
+        for i in range(hashCount):
+            index, value = HASH.unpack_from(data, offset)
+            record.hashes[index] = value
+            offset += HASH.size
+    except struct.error:
+        return None
+
+    return record
+
+# ranges without [start, end)
+def subtract(ranges, start, end):
+    result = []
+    for low, high in ranges:
+        if(high <= start or low >= end):
+            result.append([low, high])
+            continue
+        if(low < start):
+            result.append([low, start])
+        if(high > end):
+            result.append([end, high])
+
+    return result
@@ -0,0 +1,184 @@
+import os, json, time, threading, bisect, socketserver, http.server
+
+"""
+Counters, gauges and histograms for the sender and receiver
+
+A Registry holds every metric of a process. Counters and histograms are
+plain attribute updates on the hot path; a gauge (or a counter) may
+instead be given a source function, which is only called when a snapshot
+is taken, so values the protocol already keeps elsewhere (cwnd, bytes in
+flight, the RTO, PLD counts) cost nothing until someone looks.
+
+A snapshot can be taken at any moment. Dumper appends one to a JSON-lines
+file every interval from the owner's timer wheel, and serve() answers
+GET /metrics with the Prometheus text format on 127.0.0.1:port or on a
+Unix socket path, from a background thread.
+"""
+
+# seconds, for RTTs and ACK inter-arrival times
+TIME_BUCKETS = (0.0001, 0.0005, 0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, \
+    0.2, 0.5, 1, 2, 5)
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, help, source=None):
+        self.name = name
+        self.help = help
+        self.source = source
+        self.value = 0
+
+    def inc(self, amount=1):
+        self.value += amount
+
+    def read(self):
+        return self.source() if self.source is not None else self.value
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value):
+        self.value = value
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, help, bounds=TIME_BUCKETS):
+        self.name = name
+        self.help = help
+        self.bounds = bounds
+        # one count per bound plus the ones above the last bound
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.sum = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def read(self):
+        return {"count": self.count, "sum": self.sum, \
+            "buckets": dict(zip([str(bound) for bound in self.bounds] + ["+Inf"], \
+            self.cumulative()))}
+
+    def cumulative(self):
+        total = 0
+        counts = []
+        for count in self.counts:
+            total += count
+            counts.append(total)
+
+        return counts
+
+class Registry:
+    def __init__(self, labels=None):
+        # labels every metric of this process carries, e.g. the worker
+        self.labels = labels or {}
+        self.metrics = []
+
+    def add(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def counter(self, name, help, source=None):
+        return self.add(Counter(name, help, source))
+
+    def gauge(self, name, help, source=None):
+        return self.add(Gauge(name, help, source))
+
+    def histogram(self, name, help, bounds=TIME_BUCKETS):
+        return self.add(Histogram(name, help, bounds))
+
+    def snapshot(self):
+        values = {"time": time.time(), **self.labels}
+        for metric in self.metrics:
+            values[metric.name] = metric.read()
+
+        return values
+
+    def prometheus(self):
+        labels = ",".join(name + '="' + str(value) + '"' for name, value in \
+            self.labels.items())
+        lines = []
+        for metric in self.metrics:
+            lines.append("# HELP " + metric.name + " " + metric.help)
+            lines.append("# TYPE " + metric.name + " " + metric.kind)
+            if(metric.kind != "histogram"):
+                lines.append(metric.name + braces(labels) + " " + str(metric.read()))
+                continue
+
+            for bound, count in zip([str(bound) for bound in metric.bounds] + \
+                    ["+Inf"], metric.cumulative()):
+                lines.append(metric.name + "_bucket" + braces(labels, \
+                    'le="' + bound + '"') + " " + str(count))
+            lines.append(metric.name + "_sum" + braces(labels) + " " + str(metric.sum))
+            lines.append(metric.name + "_count" + braces(labels) + " " + \
+                str(metric.count))
+
+        return "\n".join(lines) + "\n"
+
+def braces(*labels):
+    labels = ",".join(label for label in labels if label)
+    return "{" + labels + "}" if labels else ""
+
+# appends a snapshot to path every interval seconds while wheel turns
+class Dumper:
+    def __init__(self, registry, path, interval, wheel):
+        self.registry = registry
+        self.file = open(path, 'a')
+        self.interval = interval
+        self.wheel = wheel
+        self.timer = wheel.schedule(interval, self.dump)
+
+    def dump(self):
+        self.write()
+        self.timer = self.wheel.schedule(self.interval, self.dump)
+
+    def write(self):
+        self.file.write(json.dumps(self.registry.snapshot()) + "\n")
+        self.file.flush()
+
+    # the last snapshot is always written
+    def close(self):
+        self.timer.cancel()
+        self.write()
+        self.file.close()
+
+class Handler(http.server.BaseHTTPRequestHandler):
+    def do_GET(self):
+        if(self.path not in ("/", "/metrics")):
+            self.send_error(404)
+            return
+
+        body = self.server.registry.prometheus().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    # scrapes are not worth a line on stderr each
+    def log_message(self, format, *args):
+        pass
+
+class HttpServer(socketserver.ThreadingMixIn, http.server.HTTPServer):
+    daemon_threads = True
+
+class UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+# serves registry on 127.0.0.1:where when it is a port number, on the Unix
+# socket path where otherwise, returns the server to shutdown() later
+def serve(registry, where):
+    if(str(where).isdigit()):
+        server = HttpServer(('127.0.0.1', int(where)), Handler)
+    else:
+        # left behind by an earlier run
+        if(os.path.exists(where)):
+            os.unlink(where)
+        server = UnixServer(where, Handler)
+    server.registry = registry
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    return server
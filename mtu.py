@@ -0,0 +1,93 @@
+import socket, sys, os, errno
+import wire
+
+"""
+Socket buffer sizes and path MTU discovery for both endpoints
+
+setBuffers() grows SO_RCVBUF/SO_SNDBUF to what a window of segments of the
+agreed size needs (the kernel caps it at net.core.rmem_max/wmem_max).
+
+On Linux forbidFragments() sets IP_MTU_DISCOVER to IP_PMTUDISC_DO: every
+datagram leaves with DF set and a send larger than the path MTU the kernel
+knows about fails with EMSGSIZE instead of being fragmented, and pathMtu()
+reads that MTU from a connected socket. Elsewhere both do nothing and a
+probe only learns from what comes back.
+"""
+
+# from linux/in.h, the socket module does not export them
+IP_MTU_DISCOVER = 10
+IP_PMTUDISC_DO = 2
+IP_MTU = 14
+
+# IPv4 and UDP headers in front of every datagram
+IP_UDP_HEADERS = 28
+
+LINUX = sys.platform.startswith("linux")
+
+# the (receive, send) buffer sizes the kernel granted, neither is shrunk
+def setBuffers(sock, receive=0, send=0):
+    for option, size in ((socket.SO_RCVBUF, receive), (socket.SO_SNDBUF, send)):
+        if(size > sock.getsockopt(socket.SOL_SOCKET, option)):
+            sock.setsockopt(socket.SOL_SOCKET, option, size)
+
+    return sock.getsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF), \
+        sock.getsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF)
+
+# the previous setting to hand to allowFragments(), None where unsupported
+def forbidFragments(sock):
+    if(not LINUX):
+        return None
+
+    previous = sock.getsockopt(socket.IPPROTO_IP, IP_MTU_DISCOVER)
+    sock.setsockopt(socket.IPPROTO_IP, IP_MTU_DISCOVER, IP_PMTUDISC_DO)
+    return previous
+
+def allowFragments(sock, previous):
+    if(previous is not None):
+        sock.setsockopt(socket.IPPROTO_IP, IP_MTU_DISCOVER, previous)
+
+# datagrams the kernel dropped because the socket's receive buffer was
+# full, None where it can't say
+def socketDrops(sock):
+    if(not LINUX):
+        return None
+
+    inode = str(os.fstat(sock.fileno()).st_ino)
+    for table in ("/proc/net/udp", "/proc/net/udp6"):
+        try:
+            with open(table) as file:
+                for line in file:
+                    fields = line.split()
+                    if(len(fields) > 12 and fields[9] == inode):
+                        return int(fields[-1])
+        except OSError:
+            continue
+
+    return None
+
+# the path MTU the kernel knows for a connected socket, None if it can't say
+def pathMtu(sock):
+    if(not LINUX):
+        return None
+    try:
+        return sock.getsockopt(socket.IPPROTO_IP, IP_MTU)
+    except OSError:
+        return None
+
+# the largest payload a data segment can carry within mtu
+def mssFor(mtu):
+    return min(mtu - IP_UDP_HEADERS - wire.DATA_OVERHEAD, wire.MAX_MSS)
+
+# True when data went out, False when it is larger than the path allows
+def sendWhole(sock, data):
+    try:
+        if(type(data) is tuple):
+            sock.sendmsg(data)
+        else:
+            sock.send(data)
+    except OSError as error:
+        if(error.errno == errno.EMSGSIZE):
+            return False
+        raise
+
+    return True
@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+
+import socket, sys, time, random, heapq, selectors, signal
+from collections import deque
+from options import parseOptions
+
+"""
+Network emulator: a UDP proxy to put between sender.py and receiver.py
+
+Datagrams from a sender to listen_port are forwarded to the receiver, and
+the receiver's answers go back the same way. Every client gets its own
+upstream socket, so the receiver still sees one address per sender. Each
+direction is a Link with
+
+    rate        bottleneck bandwidth in bits/s (k, m, g suffixes), 0 is unlimited
+    queue       datagrams the bottleneck buffers before it tail drops
+    delay       one way propagation delay in ms
+    jitter      uniform +-jitter ms on top of delay, order is kept
+    loss        probability a datagram is lost before the bottleneck
+    duplicate   probability a datagram is delivered twice
+    reorder     probability a datagram skips the propagation delay and
+                overtakes the ones in flight (like netem's reorder)
+    mtu         largest IP packet (UDP payload plus 28 bytes of headers)
+                the link carries, larger ones are lost, 0 is unlimited
+
+Every link option is either one value for both directions or
+"forward:reverse", e.g. --loss=0.02:0 only loses data, never ACKs.
+Deliveries wait in a heap ordered by due time; the loop sleeps in the
+selector until the next one is due and spins for the last SPIN seconds,
+since epoll cannot wake up more precisely than a millisecond.
+
+Usage: ./netem.py listen_port receiver_host receiver_port [--rate=10m]
+    [--queue=100] [--delay=20] [--jitter=2] [--loss=0.01] [--duplicate=0]
+    [--reorder=0] [--mtu=1500] [--seed=1] [--idle=120]
+"""
+
+SPIN = 0.001
+IP_UDP_HEADERS = 28
+
+OPTIONS = {
+    "rate": "0",
+    "queue": "1000",
+    "delay": "0",
+    "jitter": "0",
+    "loss": "0",
+    "duplicate": "0",
+    "reorder": "0",
+    "mtu": "0",
+    "seed": 0,
+    "idle": 120.0,          # seconds before an unused client mapping is dropped
+}
+
+class Link:
+    def __init__(self, name, rate=0, queue=1000, delay=0, jitter=0, loss=0, \
+            duplicate=0, reorder=0, mtu=0, rng=None):
+        self.name = name
+        self.rate = rate
+        self.queue = queue
+        self.delay = delay
+        self.jitter = jitter
+        self.loss = loss
+        self.duplicate = duplicate
+        self.reorder = reorder
+        self.mtu = mtu
+        self.rng = rng or random.Random()
+
+        # when the bottleneck finishes serialising what it already holds,
+        # and when each of the datagrams still in its queue leaves it
+        self.busyUntil = 0
+        self.backlog = deque()
+        # deliveries never overtake each other unless reordered
+        self.lastDue = 0
+
+        self.received = 0
+        self.lost = 0
+        self.tooBig = 0
+        self.queueDrops = 0
+        self.duplicated = 0
+        self.reordered = 0
+        self.delivered = 0
+
+    # due times for a datagram of size bytes that arrives now, empty when
+    # it is dropped, two of them when it is duplicated
+    def admit(self, size, now):
+        self.received += 1
+        if(self.mtu and size + IP_UDP_HEADERS > self.mtu):
+            self.tooBig += 1
+            return []
+        rng = self.rng
+        if(self.loss and rng.random() < self.loss):
+            self.lost += 1
+            return []
+
+        copies = 1
+        if(self.duplicate and rng.random() < self.duplicate):
+            copies = 2
+            self.duplicated += 1
+
+        backlog = self.backlog
+        while(backlog and backlog[0] <= now):
+            backlog.popleft()
+
+        dues = []
+        for copy in range(copies):
+            if(len(backlog) >= self.queue):
+                self.queueDrops += 1
+                continue
+
+            # serialisation at the bottleneck
+            departure = now
+            if(self.rate):
+                departure = max(now, self.busyUntil) + size * 8 / self.rate
+                self.busyUntil = departure
+                backlog.append(departure)
+
+            if(self.reorder and rng.random() < self.reorder):
+                self.reordered += 1
+                dues.append(departure)
+                continue
+
+            due = departure + self.delay
+            if(self.jitter):
+                due += rng.uniform(-self.jitter, self.jitter)
+            due = max(due, self.lastDue, departure)
+            self.lastDue = due
+            dues.append(due)
+
+        return dues
+
+    def stats(self):
+        return '{:>8}\t{:>8}\t{:>8}\t{:>8}\t{:>8}\t{:>8}\t{:>8}\t{:>8}'.format(\
+            self.name, self.received, self.lost, self.tooBig, self.queueDrops, \
+            self.duplicated, self.reordered, self.delivered)
+
+def main():
+    msg = "Usage: ./netem.py listen_port receiver_host receiver_port " \
+        "[--rate=bits/s] [--queue=datagrams] [--delay=ms] [--jitter=ms] " \
+        "[--loss=p] [--duplicate=p] [--reorder=p] [--mtu=bytes] [--seed=n] " \
+        "[--idle=seconds]\n" \
+        "link options take one value or forward:reverse"
+    if(len(sys.argv) < 4):
+        sys.exit(msg)
+    options = parseOptions(sys.argv[4:], OPTIONS, msg)
+
+    listen_port = int(sys.argv[1])
+    target = (sys.argv[2], int(sys.argv[3]))
+
+    try:
+        forward, reverse = createLinks(options)
+    except ValueError as error:
+        sys.exit(str(error) + "\n" + msg)
+
+    # stats are printed however we are stopped
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    try:
+        run(listen_port, target, forward, reverse, options["idle"])
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print('{:>8}\t{:>8}\t{:>8}\t{:>8}\t{:>8}\t{:>8}\t{:>8}\t{:>8}'.format(\
+            "link", "in", "lost", "too big", "qdrop", "dup", "reorder", "out"))
+        print(forward.stats())
+        print(reverse.stats())
+
+def createLinks(options):
+    rng = random.Random(options["seed"])
+    links = []
+    for direction in (0, 1):
+        value = lambda name, parse=float: parse(split(options[name])[direction])
+        links.append(Link("forward" if direction == 0 else "reverse", \
+            rate=value("rate", parseRate), queue=value("queue", int), \
+            delay=value("delay") / 1000, jitter=value("jitter") / 1000, \
+            loss=value("loss"), duplicate=value("duplicate"), \
+            reorder=value("reorder"), mtu=value("mtu", int), rng=rng))
+
+    return links
+
+# "x" is the same value both ways, "x:y" is forward x and reverse y
+def split(value):
+    parts = value.split(":")
+    if(len(parts) == 1):
+        return parts * 2
+    if(len(parts) == 2):
+        return parts
+    raise ValueError("bad link option " + value)
+
+def parseRate(value):
+    value = value.lower()
+    for unit in ("bit/s", "bps", "bit"):
+        if(value.endswith(unit)):
+            value = value[:-len(unit)]
+    scale = {"k": 1e3, "m": 1e6, "g": 1e9}.get(value[-1:], 1)
+    if(scale != 1):
+        value = value[:-1]
+
+    return float(value) * scale
+
+def run(listen_port, target, forward, reverse, idle):
+    listener = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    listener.bind(('127.0.0.1', listen_port))
+    listener.setblocking(False)
+    selector = selectors.DefaultSelector()
+    selector.register(listener, selectors.EVENT_READ, None)
+
+    # client address -> [upstream socket, last used]
+    upstreams = {}
+    # (due, order, link, socket, data, address) of every datagram in flight
+    pending = []
+    order = 0
+    lastSweep = time.monotonic()
+
+    while True:
+        timeout = None
+        if(pending):
+            timeout = max(0, pending[0][0] - time.monotonic() - SPIN)
+        events = selector.select(timeout)
+
+        now = time.monotonic()
+        for key, mask in events:
+            sock = key.fileobj
+            while True:
+                try:
+                    data, address = sock.recvfrom(65535)
+                except BlockingIOError:
+                    break
+                except ConnectionRefusedError:
+                    # an upstream socket hears that the receiver isn't up (yet)
+                    continue
+
+                if(sock is listener):
+                    entry = upstreams.get(address)
+                    if(entry is None):
+                        upstream = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+                        upstream.connect(target)
+                        upstream.setblocking(False)
+                        selector.register(upstream, selectors.EVENT_READ, address)
+                        entry = upstreams[address] = [upstream, now]
+                    entry[1] = now
+                    link, out, destination = forward, entry[0], None
+                else:
+                    link, out, destination = reverse, listener, key.data
+
+                for due in link.admit(len(data), now):
+                    heapq.heappush(pending, (due, order, link, out, data, destination))
+                    order += 1
+
+        # deliver everything that is due, spinning out the last moments
+        while(pending and pending[0][0] - time.monotonic() <= SPIN):
+            due, seq, link, out, data, destination = pending[0]
+            if(due > time.monotonic()):
+                continue
+            heapq.heappop(pending)
+            try:
+                if(destination is None):
+                    out.send(data)
+                else:
+                    out.sendto(data, destination)
+                link.delivered += 1
+            except OSError:
+                # nobody listening on the other side (yet)
+                pass
+
+        if(idle and now - lastSweep > idle):
+            lastSweep = now
+            for address, (upstream, used) in list(upstreams.items()):
+                if(now - used > idle):
+                    selector.unregister(upstream)
+                    upstream.close()
+                    del upstreams[address]
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,29 @@
+import sys
+
+"""
+Optional --name=value arguments accepted after the positional ones
+
+Each option's default decides how its value is parsed: a bool option may
+be given bare (--flag), everything else is converted with the default's
+type.
+"""
+
+def parseOptions(args, defaults, usage):
+    options = dict(defaults)
+    for arg in args:
+        name, sep, value = arg[2:].partition("=")
+        if(not arg.startswith("--") or name not in defaults):
+            sys.exit("Unknown option: " + arg + "\n" + usage)
+
+        default = defaults[name]
+        try:
+            if(isinstance(default, bool)):
+                options[name] = not sep or value.lower() in ("1", "true", "yes", "on")
+            elif(default is None or isinstance(default, str)):
+                options[name] = value
+            else:
+                options[name] = type(default)(value)
+        except ValueError:
+            sys.exit("Bad value for option: " + arg + "\n" + usage)
+
+    return options
@@ -0,0 +1,86 @@
+import time
+
+"""
+Pacing for the sender's new data
+
+Without pacing every segment the window allows leaves back to back, and
+a window that opens by a whole RTT's worth at once overflows the
+receiver's socket buffer. Pacer is a token bucket between the window and
+the socket. Tokens (bytes) trickle in at rate, a segment may leave while
+the bucket is not in debt and its size is taken out, and at most BUCKET
+segments' worth can pile up while the sender is idle.
+
+The rate is either fixed (--pace=bytes/s) or follows the congestion
+window (--pace=auto): cwnd / RTT scaled by a gain, as Linux's fq does,
+so pacing spreads a window over the RTT instead of holding it below what
+cwnd allows. Retransmissions are not paced, they are late already.
+
+epoll only sleeps in whole milliseconds, which at 1000 byte segments
+would cap the rate at 1 MB/s, so gaps shorter than FINE are slept with
+time.sleep() (nanosleep) instead.
+"""
+
+# gain over cwnd / RTT in slow start and in congestion avoidance
+SLOW_START_GAIN = 2.0
+GAIN = 1.2
+# segments of tokens kept at most
+BUCKET = 2
+FINE = 0.001
+
+class Pacer:
+    # rate in bytes per second, 0 follows the congestion window
+    def __init__(self, mss, rate=0, clock=time.monotonic):
+        self.fixed = rate
+        self.rate = rate
+        self.capacity = BUCKET * mss
+        self.tokens = self.capacity
+        self.clock = clock
+        self.last = clock()
+        self.waits = 0
+
+    # the rate for a window of cwnd bytes per rtt seconds, unless fixed
+    def update(self, cwnd, rtt, slowStart=False):
+        if(self.fixed or not rtt):
+            return
+        self.rate = (SLOW_START_GAIN if slowStart else GAIN) * cwnd / rtt
+
+    def refill(self):
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.last) * self.rate)
+        self.last = now
+
+    # True when a segment may leave now, always without a rate yet
+    def ready(self):
+        if(not self.rate):
+            return True
+        self.refill()
+        return self.tokens > 0
+
+    def consume(self, size):
+        if(self.rate):
+            self.tokens -= size
+
+    # seconds until ready() turns True
+    def delay(self):
+        if(not self.rate or self.tokens > 0):
+            return 0
+        self.waits += 1
+        return -self.tokens / self.rate
+
+# None for off, 0 for auto, else bytes per second with an optional k, m or g
+def parse(value):
+    value = value.lower()
+    if(value == "off"):
+        return None
+    if(value == "auto"):
+        return 0
+
+    scale = {"k": 1e3, "m": 1e6, "g": 1e9}.get(value[-1:], 1)
+    if(scale != 1):
+        value = value[:-1]
+    rate = float(value) * scale
+    # nan compares false too
+    if(not (0 < rate < float("inf"))):
+        raise ValueError("pacing rate must be a positive number of bytes/s")
+
+    return rate
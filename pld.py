@@ -0,0 +1,261 @@
+import random, array, struct, sys
+from checksum import corrupt
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+"""
+Packet loss and delay (PLD) fault injection for the sender
+
+The decision for every segment handed to PLD (send, drop, duplicate,
+corrupt, reorder or delay, plus the delay in ms) is precomputed in bulk
+from the seed into a Schedule, so applying it is an array lookup and the
+fault pattern no longer depends on what else the sender does between two
+segments. A schedule can be exported to a file and replayed later to
+re-run exactly the same faults.
+
+Two generators fill a schedule:
+
+    legacy  - python's random module drawing five values per segment (and
+              randint for a delay) in the same order the original pld()
+              did, so a seed gives the faults it always gave
+    numpy   - vectorized draws from numpy's default generator, a different
+              (but just as reproducible) pattern for the same seed, only
+              when asked for so that a seed means the same faults on every
+              host whether or not numpy is installed there
+
+PLD applies a schedule: it sends, drops, corrupts and duplicates segments,
+holds one back until maxOrder others have gone out (or half a timeout has
+passed) and releases delayed ones from the timer wheel.
+"""
+
+SEND = 0
+DROP = 1
+DUPLICATE = 2
+CORRUPT = 3
+REORDER = 4
+DELAY = 5
+
+# decisions are generated this many at a time
+BLOCK = 4096
+
+# exported schedules: magic, format version, number of decisions, followed
+# by one byte per decision and a big endian uint32 delay (ms) per decision
+FILE_HEADER = struct.Struct("!4sBI")
+FILE_MAGIC = b"PLDS"
+
+class Schedule:
+    def __init__(self, pDrop=0, pDuplicate=0, pCorrupt=0, pOrder=0, pDelay=0, \
+            maxDelay=0, seed=None, generator="legacy"):
+        self.rates = (pDrop, pDuplicate, pCorrupt, pOrder, pDelay)
+        self.maxDelay = int(maxDelay)
+        if(generator == "numpy" and numpy is None):
+            raise ValueError("the numpy generator needs numpy installed")
+        if(generator not in ("legacy", "numpy", "replay")):
+            raise ValueError("unknown PLD generator " + generator)
+        self.generator = generator
+        if(generator == "numpy"):
+            self.rng = numpy.random.default_rng(seed)
+        else:
+            self.rng = random.Random(seed)
+
+        self.decisions = array.array('B')
+        self.delays = array.array('I')
+        self.position = 0
+
+    def __len__(self):
+        return len(self.decisions)
+
+    # the decision and delay (ms) for the next segment
+    def next(self):
+        position = self.position
+        if(position >= len(self.decisions)):
+            if(self.generator == "replay"):
+                # a replayed pattern is clean once it runs out
+                return SEND, 0
+            self.extend(BLOCK)
+        self.position = position + 1
+
+        return self.decisions[position], self.delays[position]
+
+    def extend(self, count):
+        if(self.generator == "numpy"):
+            self.extendNumpy(count)
+        else:
+            self.extendLegacy(count)
+
+    def extendLegacy(self, count):
+        pDrop, pDuplicate, pCorrupt, pOrder, pDelay = self.rates
+        draw = self.rng.random
+        decisions = self.decisions
+        delays = self.delays
+        for i in range(count):
+            dropRate = draw()
+            dupRate = draw()
+            crptRate = draw()
+            orderRate = draw()
+            delayRate = draw()
+
+            delay = 0
+            if(dropRate < pDrop):
+                decision = DROP
+            elif(dupRate < pDuplicate):
+                decision = DUPLICATE
+            elif(crptRate < pCorrupt):
+                decision = CORRUPT
+            elif(orderRate < pOrder):
+                decision = REORDER
+            elif(delayRate < pDelay):
+                decision = DELAY
+                delay = self.rng.randint(0, self.maxDelay)
+            else:
+                decision = SEND
+            decisions.append(decision)
+            delays.append(delay)
+
+    def extendNumpy(self, count):
+        draws = self.rng.random((count, 5))
+        hits = draws < numpy.array(self.rates)
+        # the first rate that hit wins, in the order pld() always checked them
+        decisions = numpy.where(hits.any(axis=1), hits.argmax(axis=1) + 1, SEND)
+        delays = self.rng.integers(0, self.maxDelay, count, endpoint=True)
+        delays[decisions != DELAY] = 0
+
+        self.decisions.frombytes(decisions.astype(numpy.uint8).tobytes())
+        self.delays.frombytes(delays.astype(numpy.uint32).tobytes())
+
+    # writes the first count decisions (all generated ones by default)
+    def export(self, path, count=None):
+        if(count is None):
+            count = len(self.decisions)
+        delays = array.array('I', self.delays[:count])
+        if(sys.byteorder == "little"):
+            delays.byteswap()
+
+        with open(path, 'wb') as file:
+            file.write(FILE_HEADER.pack(FILE_MAGIC, 1, count))
+            file.write(self.decisions[:count].tobytes())
+            file.write(delays.tobytes())
+
+def load(path):
+    with open(path, 'rb') as file:
+        magic, version, count = FILE_HEADER.unpack(file.read(FILE_HEADER.size))
+        if(magic != FILE_MAGIC or version != 1):
+            raise ValueError(path + " is not a PLD schedule")
+        schedule = Schedule(generator="replay")
+        schedule.decisions.frombytes(file.read(count))
+        schedule.delays.frombytes(file.read(count * schedule.delays.itemsize))
+
+    if(len(schedule.decisions) != count or len(schedule.delays) != count):
+        raise ValueError(path + " is truncated")
+    if(sys.byteorder == "little"):
+        schedule.delays.byteswap()
+
+    return schedule
+
+class PLD:
+    # transmit(packet) puts a segment on the wire, log(packet, type, symbol)
+    # records it and holdTime() is how long a held segment may wait
+    def __init__(self, schedule, maxOrder, transmit, log, wheel, holdTime):
+        self.schedule = schedule
+        self.maxOrder = maxOrder
+        self.transmit = transmit
+        self.log = log
+        self.wheel = wheel
+        self.holdTime = holdTime
+
+        # the segment held back for reordering and how many went out since
+        self.heldPacket = None
+        self.heldTimer = None
+        self.orderCount = 0
+
+        self.dropped = 0
+        self.duplicated = 0
+        self.corrupted = 0
+        self.reOrdered = 0
+        self.delayed = 0
+
+    def __call__(self, packet, type):
+        decision, delay = self.schedule.next()
+        symbol = symbolOf(packet)
+
+        if(decision == DROP):
+            self.log(packet, "drop", symbol)
+            self.dropped += 1
+        elif(decision == DUPLICATE):
+            self.transmit(packet)
+            self.log(packet, "snd", symbol)
+            self.transmit(packet)
+            self.log(packet, "snd/dup", symbol)
+            self.orderCount += 1
+            self.duplicated += 1
+        elif(decision == CORRUPT):
+            packet[2] = corrupt(packet[2])
+            self.transmit(packet)
+            self.log(packet, "snd/corr", symbol)
+            self.orderCount += 1
+            self.corrupted += 1
+        elif(decision == REORDER):
+            if(self.heldPacket is not None):
+                # only one segment is held at a time
+                self.orderCount += 1
+                self.transmit(packet)
+                self.log(packet, "snd", symbol)
+            else:
+                self.heldPacket = packet
+                self.orderCount = 0
+                # don't hold on to it for longer than half a timeout if fewer
+                # than maxOrder segments follow
+                self.heldTimer = self.wheel.schedule(self.holdTime(), self.releaseHeld)
+                self.reOrdered += 1
+        elif(decision == DELAY):
+            # goes out from the event loop the moment the delay is over
+            self.wheel.schedule(delay / 1000, self.releaseDelayed, packet)
+            self.delayed += 1
+        else:
+            self.transmit(packet)
+            if(type == "Rxt"):
+                self.log(packet, "snd/RXT", symbol)
+            else:
+                self.log(packet, "snd", symbol)
+            self.orderCount += 1
+
+        self.checkHeld()
+
+    def checkHeld(self):
+        if(self.orderCount == self.maxOrder and self.heldPacket is not None):
+            self.releaseHeld()
+
+    def releaseDelayed(self, packet):
+        symbol = symbolOf(packet)
+        if(symbol == "D"):
+            packet[0] = "Rxt"
+        self.transmit(packet)
+        self.log(packet, "snd/dely", symbol)
+        self.orderCount += 1
+        self.checkHeld()
+
+    def releaseHeld(self):
+        packet = self.heldPacket
+        if(packet is None):
+            return
+
+        symbol = symbolOf(packet)
+        if(symbol == "D"):
+            packet[0] = "Rxt"
+        self.transmit(packet)
+        self.log(packet, "snd/rord", symbol)
+        self.heldPacket = None
+        self.heldTimer.cancel()
+
+    # a segment still held back when the transfer ends is never sent
+    def cancel(self):
+        if(self.heldTimer is not None):
+            self.heldTimer.cancel()
+        self.heldPacket = None
+
+# repair segments (see fec.py) go through PLD like data but are logged apart
+def symbolOf(packet):
+    return "R" if packet[0] == "Fec" else "D"
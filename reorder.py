@@ -0,0 +1,90 @@
+from bisect import bisect_left, bisect_right
+
+"""
+Reassembly state for the receiver
+
+Tracks which bytes have arrived without holding their data (that is
+already on disk, see writer.py). What arrived past the next expected byte
+is kept as merged, ordered [start, end) intervals in two parallel lists, so
+a segment is placed with a binary search and merged into its neighbours as
+it comes in, and the SACK blocks are read straight off the intervals
+instead of being rebuilt for every segment. An interval is forgotten as
+soon as the cumulative point moves past it. Memory is bounded by the send
+window rather than by the size of the file.
+"""
+
+DUPLICATE = 0
+DELIVERED = 1
+BUFFERED = 2
+
+class ReorderBuffer:
+    def __init__(self, start=1):
+        self.next = start       # next expected byte, i.e. the cumulative ack
+        self.starts = []        # merged intervals past self.next, in order
+        self.stops = []
+
+    def __len__(self):
+        return len(self.starts)
+
+    def add(self, seq, length):
+        end = seq + length
+        if(self.has(seq, length)):
+            return DUPLICATE
+
+        if(seq > self.next):
+            # every interval touching [seq, end) becomes one
+            low = bisect_left(self.stops, seq)
+            high = bisect_right(self.starts, end)
+            if(low < high):
+                seq = min(seq, self.starts[low])
+                end = max(end, self.stops[high - 1])
+            self.starts[low:high] = [seq]
+            self.stops[low:high] = [end]
+            return BUFFERED
+
+        self.next = end
+        self.drain()
+        return DELIVERED
+
+    # True if [seq, seq + length) arrived or is acked
+    def has(self, seq, length):
+        end = seq + length
+        if(end <= self.next):
+            return True
+
+        i = bisect_right(self.starts, seq) - 1
+        return i >= 0 and self.stops[i] >= end
+
+    def drain(self):
+        i = bisect_right(self.starts, self.next)
+        if(i):
+            self.next = max(self.next, self.stops[i - 1])
+            del self.starts[:i]
+            del self.stops[:i]
+
+    # merged [start, end) ranges held past the cumulative point
+    def ranges(self):
+        return [[start, end] for start, end in zip(self.starts, self.stops)]
+
+    # [start, end) ranges still missing below the highest byte held
+    def holes(self):
+        return list(zip([self.next] + self.stops[:-1], self.starts))
+
+    # SACK blocks: the range holding seq first (the most recent arrival), then
+    # the others in order, at most limit of them
+    def sackBlocks(self, seq, limit):
+        starts, stops = self.starts, self.stops
+        first = bisect_right(starts, seq) - 1
+        blocks = []
+        if(first >= 0 and seq < stops[first]):
+            blocks.append((starts[first], stops[first]))
+        else:
+            first = -1
+
+        for i in range(len(starts)):
+            if(len(blocks) == limit):
+                break
+            if(i != first):
+                blocks.append((starts[i], stops[i]))
+
+        return blocks
@@ -0,0 +1,38 @@
+"""
+Round trip time estimation and retransmission timeout for the sender
+
+The same smoothing newTimeout() always did (alpha 1/8, beta 1/4, timeout =
+estimate + gamma * deviation, clamped to [0.2, 60] seconds), except that
+the first sample now seeds the estimate directly (RFC 6298) instead of
+being averaged into made up starting values, and a timeout doubles the
+current value until the next valid sample arrives.
+"""
+
+ALPHA = 0.125
+BETA = 0.25
+MIN_TIMEOUT = 0.20
+MAX_TIMEOUT = 60
+
+class RttEstimator:
+    def __init__(self, gamma, timeout=1):
+        self.gamma = gamma
+        self.estimatedRTT = None
+        self.devRTT = None
+        self.timeout = timeout
+
+    def sample(self, sample):
+        if(self.estimatedRTT is None):
+            self.estimatedRTT = sample
+            self.devRTT = sample / 2
+        else:
+            self.estimatedRTT = (1 - ALPHA) * self.estimatedRTT + ALPHA * sample
+            self.devRTT = (1 - BETA) * self.devRTT + \
+                BETA * abs(sample - self.estimatedRTT)
+
+        self.timeout = clamp(self.estimatedRTT + self.gamma * self.devRTT)
+
+    def backoff(self):
+        self.timeout = clamp(self.timeout * 2)
+
+def clamp(timeout):
+    return min(max(timeout, MIN_TIMEOUT), MAX_TIMEOUT)
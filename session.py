@@ -0,0 +1,417 @@
+import time
+import wire, compress, fec
+from writer import OutputWriter
+from reorder import ReorderBuffer, DUPLICATE, DELIVERED
+from checksum import checkSum
+
+"""
+One transfer as the receiver sees it
+
+Everything receiver.py used to keep in module globals lives on a Session:
+the wire version agreed in the handshake, the reassembly state, the output
+file, the ACK held back for in order data and the counters for the log
+summary. The receiver keeps one per (address, connection id), so a single
+socket can serve any number of senders at once.
+
+A Transfer is the output file a session writes to. A file sent in parallel
+over several streams has one Transfer shared by all of their sessions, each
+writing its own byte range, and the file is closed when the last of them
+is done. With several worker processes the streams of one file can land on
+different workers, each then opens the same file without truncating it.
+
+A transfer the sender may resume keeps a manifest of what is on disk (see
+manifest.py). The session saves it every SAVE_INTERVAL seconds and when it
+is dropped, starts out holding what it lists and tells the sender in the
+Synack, and removes it once the whole file has arrived.
+"""
+
+OPEN = 0
+CLOSING = 1         # our Fin is out, waiting for the sender's last ACK
+CLOSED = 2
+
+# seconds between two saves of a resumable transfer's manifest
+SAVE_INTERVAL = 1.0
+
+# what a sender sends a receiver, and which of it has a payload
+HANDLED = ("Syn", "Ack", "Probe", "Psh", "Rxt", "Fec", "Fin")
+CARRY_DATA = ("Psh", "Rxt", "Fec")
+
+class Transfer:
+    # output replaces the file at path, e.g. with a writer.StreamWriter,
+    # ended(complete) is called once the transfer is over
+    def __init__(self, path, streams=1, shared=False, manifest=None, output=None, \
+            ended=None):
+        self.path = path
+        # other processes may be writing their streams to a shared file
+        self.shared = shared
+        # what a resumable transfer already holds, see manifest.py
+        self.manifest = manifest
+        resumed = manifest is not None and manifest.ranges
+        self.output = output
+        if(output is None):
+            self.output = OutputWriter(path, truncate=not shared and not resumed)
+        self.ended = ended
+        self.streams = streams
+        self.active = 0
+        self.done = 0
+        self.closed = False
+        self.complete = True
+
+    def open(self):
+        self.active += 1
+
+    # a shared file is closed once this process has no stream of it left,
+    # a later stream simply opens it again
+    def finish(self, complete=True):
+        self.active -= 1
+        self.done += 1
+        self.complete = self.complete and complete
+        if(self.done >= self.streams or (self.shared and not self.active)):
+            self.output.close()
+            self.closed = True
+            if(self.ended is not None):
+                self.ended(self.complete)
+
+class Session:
+    def __init__(self, address, connId, transfer, outbox, wheel, log, \
+            ackDelay=0.04, ackEvery=2, offset=0, trace=False, maxMss=wire.MAX_MSS, \
+            compression=True, repair=True):
+        self.address = address
+        self.connId = connId
+        self.transfer = transfer
+        self.offset = offset
+        self.outbox = outbox
+        self.wheel = wheel
+        self.log = log
+        self.ackDelay = ackDelay
+        self.ackEvery = max(1, ackEvery)
+        # the debug prints cost nothing unless asked for
+        self.trace = trace
+
+        self.peerVersion = wire.VERSION_PICKLE
+        # the largest segment we take and the one agreed in the handshake
+        self.maxMss = maxMss
+        self.mss = 0
+        # payload codec the sender may use, see compress.py
+        self.compression = compression
+        self.codec = None
+        # whether we rebuild lost segments from repair segments, see fec.py
+        self.repair = repair
+        self.state = OPEN
+        self.lastSeen = time.monotonic()
+
+        # every segment goes straight to its offset in the output file,
+        # reorder only tracks which byte ranges have arrived
+        self.output = transfer.output
+        self.reorder = ReorderBuffer()
+        transfer.open()
+
+        self.manifest = transfer.manifest
+        self.complete = False
+        self.saveTimer = None
+        if(self.manifest is not None):
+            for start, end in self.manifest.ranges:
+                self.reorder.add(start + 1, end - start)
+            self.saveTimer = wheel.schedule(SAVE_INTERVAL, self.saveManifest)
+
+        # in order segments not acked yet, and what their ACK will carry
+        self.unacked = 0
+        self.pendingEcho = None
+        self.pendingSeq = 0
+        self.ackTimer = None
+
+        self.dataReceived = 0
+        self.bytesWritten = 0
+        self.dataSegments = 0
+        self.bitErrors = 0
+        self.dupPackets = 0
+        self.dupAckPackets = 0
+        self.recovered = 0
+
+    def handle(self, list, version, flags, options):
+        type = list[0]
+        length = list[1]
+        chkSum = list[2]
+        seqNum = list[3]
+        ackNum = list[4]
+        msg = b""
+        self.lastSeen = time.monotonic()
+
+        if(len(list) == 6):
+            msg = list[5]
+        self.validate(type, length, seqNum, msg, flags)
+
+        if(chkSum != 0 and checkSum(msg) != chkSum):
+            self.bitErrors += 1
+            self.dataSegments += 1
+            if(self.trace):
+                print("CheckSum was violated! Ignore corrupted packet!")
+            self.log(list, "rcv/corr", "R" if type == "Fec" else "D")
+            return
+
+        # every ACK echoes the timestamp of the segment that triggered it
+        echo = echoOf(options)
+        response = []
+        if(type == "Syn"):
+            # a pickled Syn may advertise a newer wire version to switch to
+            self.peerVersion = version
+            synOptions = options
+            if(self.peerVersion == wire.VERSION_PICKLE):
+                self.peerVersion, synOptions = wire.advertised(msg)
+                echo = echoOf(synOptions)
+            self.log(list, "rcv", "S")
+            response = createAck("Synack", 0, seqNum + 1)
+            # a sender that offers an MSS hears how much of it we take
+            offered = wire.readMss(synOptions)
+            if(offered):
+                self.mss = min(offered, self.maxMss)
+                echo = {**(echo or {}), **wire.mss(self.mss)}
+            if(self.compression):
+                self.codec = compress.choose(wire.readCompression(synOptions))
+            if(self.codec is not None):
+                echo = {**(echo or {}), **wire.compression([self.codec.id])}
+            if(self.repair and wire.readFec(synOptions) is not None):
+                echo = {**(echo or {}), **wire.fec()}
+            # a resumed transfer only needs what we don't hold yet
+            if(self.manifest is not None and wire.readResume(synOptions)):
+                echo = {**(echo or {}), **wire.ranges(self.heldRanges())}
+            self.log(response, "snd", "SA")
+        elif(type == "Ack"):
+            self.log(list, "rcv", "A")
+            if(self.state == CLOSING):
+                self.state = CLOSED
+            return
+        elif(type == "Probe"):
+            # path MTU probing, the sender learns the padding arrived whole
+            response = createAck("Probe", 0, len(msg))
+        elif(type == "Psh" or type == "Rxt"):
+            result = self.receiveData(list, echo, flags)
+            if(result is None):
+                return
+            response, echo = result
+        elif(type == "Fec"):
+            self.log(list, "rcv", "R")
+            result = self.rebuild(msg, ackNum, echo)
+            if(result is None):
+                return
+            response, echo = result
+        elif(type == "Fin"):
+            self.flushAck()
+            self.dataReceived = seqNum - 1
+            self.complete = self.reorder.next == seqNum
+            self.log(list, "rcv", "F")
+            response = createAck("Ack", ackNum, seqNum + 1)
+            self.reply(response, echo)
+            self.log(response, "snd", "A")
+            if(self.trace):
+                print("\n", response)
+
+            response = createAck("Fin", ackNum, seqNum + 1)
+            self.log(response, "snd", "F")
+            self.state = CLOSING
+
+        if(response):
+            self.reply(response, echo)
+        # print the responses from server to client
+        if(self.trace):
+            print(response)
+
+    # raises ValueError for a segment a sender can't have meant, the receiver
+    # drops it before any state changes
+    def validate(self, type, length, seqNum, msg, flags):
+        if(type not in HANDLED):
+            raise ValueError("unexpected " + str(type) + " segment")
+        if(type in CARRY_DATA):
+            if(not msg):
+                raise ValueError(type + " segment without a payload")
+            if(seqNum < 1):
+                raise ValueError(type + " segment at sequence number 0")
+        if(flags & wire.FLAG_COMPRESSED):
+            if(self.codec is None or type not in ("Psh", "Rxt")):
+                raise ValueError("compressed " + type + " segment without an agreed codec")
+        elif(type in ("Psh", "Rxt") and len(msg) != length):
+            raise ValueError(type + " segment of " + str(len(msg)) + " bytes claims " + \
+                str(length))
+        if(type == "Fec"):
+            # every segment a repair covers is read back from the output
+            entries, parity = fec.decode(msg)
+            if(len(parity) > (self.mss or self.maxMss)):
+                raise ValueError("Fec segment with " + str(len(parity)) + \
+                    " bytes of parity")
+            for seq, size in entries:
+                if(seq < 1 or not 0 < size <= len(parity)):
+                    raise ValueError("Fec segment covers " + str(size) + " bytes at " + \
+                        str(seq))
+
+    # returns the response and the options it carries, or None when the
+    # segment is a duplicate or its ACK is being held back
+    def receiveData(self, list, echo, flags=0, event="rcv"):
+        type, length, chkSum, seqNum, ackNum, msg = list
+        reorder = self.reorder
+
+        # the data can go to disk before we know whether it is in order
+        outOfOrder = len(reorder) > 0
+        # a payload that doesn't expand to length bytes never counts as held
+        if(flags & wire.FLAG_COMPRESSED):
+            msg = self.codec.expand(msg, length)
+        status = reorder.add(seqNum, length)
+        if(status == DUPLICATE):
+            self.dupPackets += 1
+            if(self.trace):
+                print("Ignoring: " + type + " packet " + str(seqNum))
+            return None
+
+        self.dataSegments += 1
+        self.log(list, event, "D")
+        self.output.write(self.offset + seqNum - 1, msg)
+        self.bytesWritten += length
+
+        # a binary (SACK capable) sender hears about everything we hold
+        # past the ack, an old one gets the separate Buf ACK instead
+        sackable = self.peerVersion > wire.VERSION_PICKLE
+        if(sackable and len(reorder)):
+            blocks = reorder.sackBlocks(seqNum, wire.MAX_SACK_BLOCKS)
+            echo = {**(echo or {}), **wire.sack(blocks)}
+
+        if(status == DELIVERED):
+            # in order data is acked every ackEvery segments or after
+            # ackDelay, a segment that fills a hole is acked at once
+            if(not outOfOrder and self.ackDelay > 0):
+                if(not self.unacked):
+                    self.pendingEcho = echo
+                    self.pendingSeq = ackNum
+                    self.ackTimer = self.wheel.schedule(self.ackDelay, self.flushAck)
+                self.unacked += 1
+                if(self.unacked < self.ackEvery):
+                    return None
+                # the ACK echoes the oldest segment it covers
+                echo = self.pendingEcho
+            self.clearPending()
+            response = createAck("Ack", ackNum, reorder.next)
+            self.log(response, "snd", "A")
+            if(self.trace):
+                print("Cumulative Ack: " + str(reorder.next))
+        else:
+            # the sender only slides its window on a plain ACK, so the one
+            # held back goes out ahead of the duplicate
+            self.flushAck()
+            if(not sackable):
+                self.reply(createAck("Buf", ackNum, seqNum + length), echo)
+            response = createAck("DupAck", ackNum, reorder.next)
+            self.dupAckPackets += 1
+            self.log(response, "snd/DA", "A")
+
+        return response, echo
+
+    # takes a lost segment back out of a repair segment when it is the only
+    # one of its block missing, the ACK for it says how many we rebuilt
+    def rebuild(self, msg, ackNum, echo):
+        entries, parity = fec.decode(msg)
+        missing = [(seq, length) for seq, length in entries \
+            if not self.reorder.has(seq, length)]
+        if(len(missing) != 1):
+            return None
+
+        seq, length = missing[0]
+        others = [self.output.read(self.offset + start - 1, size) \
+            for start, size in entries if start != seq]
+        # a stream sink only keeps so much of what it delivered
+        if(sum(len(data) for data in others) != sum(size for start, size \
+                in entries) - length):
+            return None
+        data = fec.rebuild(parity, others, length)
+        self.recovered += 1
+        if(self.trace):
+            print("Rebuilt packet " + str(seq) + " from parity")
+        result = self.receiveData(["Psh", length, 0, seq, ackNum, data], echo, \
+            event="rcv/fec")
+        if(result is None):
+            return None
+
+        response, echo = result
+        return response, {**(echo or {}), **wire.fec(self.recovered)}
+
+    # sends the ACK held back for in order data, if there is one
+    def flushAck(self):
+        if(not self.unacked):
+            return
+
+        response = createAck("Ack", self.pendingSeq, self.reorder.next)
+        self.reply(response, self.pendingEcho)
+        self.log(response, "snd", "A")
+        if(self.trace):
+            print("Cumulative Ack: " + str(self.reorder.next))
+        self.clearPending()
+
+    def clearPending(self):
+        if(self.ackTimer is not None):
+            self.ackTimer.cancel()
+            self.ackTimer = None
+        self.unacked = 0
+        self.pendingEcho = None
+
+    def reply(self, response, echo):
+        self.outbox.add(wire.encode(response, self.peerVersion, self.connId, \
+            options=echo), self.address)
+
+    # [start, end) byte ranges of the transfer on disk
+    def heldRanges(self):
+        held = [[0, self.reorder.next - 1]] if self.reorder.next > 1 else []
+        return held + [[start - 1, end - 1] for start, end in self.reorder.ranges()]
+
+    def saveManifest(self):
+        if(self.state == CLOSED):
+            return
+        self.manifest.save(self.heldRanges(), self.output.fd)
+        self.saveTimer = self.wheel.schedule(SAVE_INTERVAL, self.saveManifest)
+
+    def close(self):
+        self.stop()
+        self.transfer.finish(self.complete)
+
+    # closes this session without finishing its transfer, which a new
+    # session of the same sender is about to take over
+    def detach(self):
+        self.stop()
+        self.transfer.active -= 1
+
+    def stop(self):
+        self.clearPending()
+        if(self.saveTimer is not None):
+            self.saveTimer.cancel()
+            self.saveTimer = None
+        if(self.manifest is not None):
+            if(self.complete):
+                self.manifest.remove()
+            else:
+                self.manifest.save(self.heldRanges(), self.output.fd)
+        self.state = CLOSED
+
+    def stats(self):
+        res = "============================================================="
+        res += "\nAmount of data received (bytes))                 " + str(self.dataReceived)
+        res += "\nTotal Segments Received                          " + str(self.dataSegments + 4)
+        res += "\nData segments received                           " + str(self.dataSegments)
+        res += "\nData segments with Bit Errors                    " + str(self.bitErrors)
+        res += "\nDuplicate data segments received                 " + str(self.dupPackets)
+        res += "\nDuplicate ACKs sent                              " + str(self.dupAckPackets)
+        if(self.recovered):
+            res += "\nData segments rebuilt from parity                " + str(self.recovered)
+        res += "\n============================================================="
+
+        return res
+
+def echoOf(options):
+    stamp = options.get(wire.OPT_TIMESTAMP)
+    if(stamp is None):
+        return None
+
+    return wire.timestamp(0, stamp[0])
+
+def createAck(type, seqNum, ackNum):
+    packet = []
+    packet.append(type)
+    packet.append(seqNum)
+    packet.append(ackNum)
+
+    return packet
@@ -0,0 +1,183 @@
+import os, sys, mmap
+
+"""
+Input for the sender
+
+A regular file is memory mapped and handed out as memoryview slices, so a
+segment, its retransmissions and the window entry that keeps it alive all
+point at the same page cache pages instead of holding their own copies.
+Pages behind acked data are handed back with release() so the resident
+size stays flat however large the file is. Pipes, sockets and anything
+else that cannot be mapped are read sequentially instead ("-" reads
+stdin).
+
+The library (see stp.py) also sends what is already in memory, file
+objects it does not own and iterables of byte strings, asSource() picks
+the right kind for each.
+
+A source can also cover just the byte range [start, end) of a file, which
+is how a parallel transfer hands each stream its own part. position is how
+far into that range reading has got and skip() jumps over bytes the
+receiver already holds (see manifest.py).
+"""
+
+# release() works in steps of this many bytes (a multiple of the page size)
+RELEASE_STEP = 256 * mmap.PAGESIZE
+
+class MappedSource:
+    def __init__(self, file, start=0, end=None):
+        self.file = file
+        # copy on write only so that batch.py can point an iovec at a slice,
+        # nothing ever writes to it
+        self.map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_COPY)
+        if(hasattr(self.map, "madvise")):
+            self.map.madvise(mmap.MADV_SEQUENTIAL)
+        self.view = memoryview(self.map)
+        self.start = min(start, len(self.map))
+        self.size = len(self.map) if end is None else min(end, len(self.map))
+        self.offset = self.start
+        self.released = self.start - self.start % RELEASE_STEP
+
+    def read(self, length):
+        start = self.offset
+        self.offset = min(start + length, self.size)
+        return self.view[start:self.offset]
+
+    @property
+    def position(self):
+        return self.offset - self.start
+
+    def skip(self, length):
+        self.offset = min(self.offset + length, self.size)
+
+    # everything up to offset bytes into the source is acked, drop those
+    # pages from our mapping
+    def release(self, offset):
+        offset += self.start
+        offset -= offset % RELEASE_STEP
+        if(offset > self.released and hasattr(self.map, "madvise")):
+            self.map.madvise(mmap.MADV_DONTNEED, self.released, \
+                offset - self.released)
+            self.released = offset
+
+    def close(self):
+        self.view.release()
+        try:
+            self.map.close()
+        except BufferError:
+            # a segment still references the map, it goes with the last view
+            pass
+        self.file.close()
+
+class StreamSource:
+    # a file that isn't owned is left open for its owner
+    def __init__(self, file, start=0, end=None, owned=True):
+        self.file = file
+        self.owned = owned
+        self.size = None
+        self.left = None
+        self.position = 0
+        if(start):
+            file.seek(start)
+        if(end is not None):
+            self.left = end - start
+
+    def read(self, length):
+        if(self.left is None):
+            data = self.file.read(length)
+        else:
+            data = self.file.read(min(length, self.left))
+            self.left -= len(data)
+        self.position += len(data)
+        return data
+
+    # a stream can only be read past
+    def skip(self, length):
+        while(length > 0 and self.read(min(length, RELEASE_STEP))):
+            length -= RELEASE_STEP
+
+    def release(self, offset):
+        pass
+
+    def close(self):
+        if(self.owned):
+            self.file.close()
+
+class BufferSource:
+    def __init__(self, buffer, start=0, end=None):
+        self.view = memoryview(buffer).cast("B")
+        self.start = min(start, len(self.view))
+        self.size = len(self.view) if end is None else min(end, len(self.view))
+        self.offset = self.start
+
+    def read(self, length):
+        start = self.offset
+        self.offset = min(start + length, self.size)
+        return self.view[start:self.offset]
+
+    @property
+    def position(self):
+        return self.offset - self.start
+
+    def skip(self, length):
+        self.offset = min(self.offset + length, self.size)
+
+    def release(self, offset):
+        pass
+
+    def close(self):
+        pass
+
+# byte strings of any size from an iterator, cut to the lengths asked for
+class IterableSource:
+    def __init__(self, iterable):
+        self.iterator = iter(iterable)
+        self.buffer = bytearray()
+        self.size = None
+        self.position = 0
+
+    def read(self, length):
+        while(len(self.buffer) < length and self.iterator is not None):
+            try:
+                self.buffer += next(self.iterator)
+            except StopIteration:
+                self.iterator = None
+        data = bytes(self.buffer[:length])
+        del self.buffer[:length]
+        self.position += len(data)
+        return data
+
+    def skip(self, length):
+        while(length > 0 and self.read(min(length, RELEASE_STEP))):
+            length -= RELEASE_STEP
+
+    def release(self, offset):
+        pass
+
+    def close(self):
+        pass
+
+# a source for a path, a bytes-like object, a readable file object or an
+# iterable of byte strings
+def asSource(data, start=0, end=None):
+    if(isinstance(data, (str, os.PathLike))):
+        return openSource(os.fspath(data), start, end)
+    if(isinstance(data, (bytes, bytearray, memoryview))):
+        return BufferSource(data, start, end)
+    if(hasattr(data, "read")):
+        return StreamSource(data, start, end, owned=False)
+    if(start or end is not None):
+        raise ValueError("an iterable can only be sent whole")
+
+    return IterableSource(data)
+
+def openSource(path, start=0, end=None):
+    if(path == "-"):
+        return StreamSource(sys.stdin.buffer)
+
+    file = open(path, 'rb')
+    try:
+        return MappedSource(file, start, end)
+    except (ValueError, OSError):
+        # empty files, pipes and other special files cannot be mapped
+        return StreamSource(file, start, end)
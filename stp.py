@@ -0,0 +1,1217 @@
+import socket, os, time, selectors, signal, sys, multiprocessing, inspect
+from collections import namedtuple
+import wire, logger, cc, pld, metrics, mtu, compress, manifest, fec, pacing
+from window import SendWindow
+from timers import TimerWheel
+from rtt import RttEstimator
+from source import asSource
+from writer import StreamWriter
+from checksum import checkSum
+from batch import Batch
+from session import Session, Transfer, CLOSED
+
+"""
+The sender and receiver as a library
+
+sender.py and receiver.py are thin command line wrappers around this
+module, everything they used to keep in module globals lives on the
+objects here, so one process can run any number of transfers, one after
+another or at the same time.
+
+    receiver = stp.Receiver(5000, sink=sys.stdout.buffer)
+    sender = stp.Sender("127.0.0.1", 5000, MWS=50000, MSS=1000)
+    result = sender.send(open("file.pdf", "rb"))
+
+A Sender holds the settings, every send() opens a Connection (socket,
+window, timers, PLD, log and metrics of its own) for one transfer. What
+it sends can be a path, a bytes-like object, a readable file object or
+an iterable of byte strings (see source.py). A Receiver serves a bound
+socket, each transfer goes to a file named after sink when it is a path,
+or in order to sink.write() or sink() (one transfer only), or to the
+writable a sinkFactory returns for it (see Receiver and writer.py).
+
+Options are the command line's --name=value options (SENDER_OPTIONS and
+RECEIVER_OPTIONS), given as a dict of the ones that differ. Status lines
+go to report, print for the command line and nowhere by default, and the
+event log is off unless "log" asks for one (the command line's default is
+"text", Sender_log.txt and Receiver_log.txt in the working directory).
+"""
+
+# optional --name=value arguments after sender.py's positional ones
+SENDER_OPTIONS = {
+    "log": "off",           # text, binary or off
+    "cc": "newreno",        # congestion control, see cc.py
+    "cc-trace": "",         # file to write the cwnd trace to
+    "sendmmsg": False,      # flush bursts with one sendmmsg call, see batch.py
+    "streams": 1,           # parallel connections, each sends its own part of the file
+    "pld": "legacy",        # PLD generator: legacy or numpy, see pld.py
+    "pld-export": "",       # file to save the PLD decisions that were used to
+    "pld-replay": "",       # file with PLD decisions to apply instead of drawing
+    "trace": False,         # print every segment and ACK as it is handled
+    "metrics": "",          # file to append a JSON snapshot of the metrics to
+    "metrics-interval": 1.0,    # seconds between two snapshots
+    "metrics-listen": "",   # port or Unix socket path serving /metrics
+    "mss-probe": False,     # lower MSS to the largest segment the path carries whole
+    "sndbuf": 0,            # socket send buffer in bytes, 0 sizes it from MWS and MSS
+    "compress": "off",      # payload codec to offer: off, auto, zlib or lz4
+    "compress-level": 1,    # zlib level, speed matters more than ratio
+    "compress-workers": 2,  # threads compressing ahead of the send loop
+    "resume": False,        # pick up an interrupted transfer of the same file
+    "fec": "off",           # repair segments: off, auto (K follows the loss rate) or K
+    "pace": "off",          # pacing: off, auto (cwnd / RTT) or bytes/s (k, m, g)
+}
+
+# optional --name=value arguments after receiver.py's positional ones
+RECEIVER_OPTIONS = {
+    "log": "off",           # text, binary or off
+    "ack-delay": 0.04,      # seconds an in order ACK may be held, 0 acks every segment
+    "ack-every": 2,         # in order segments covered by one ACK
+    "sendmmsg": False,      # flush responses with one sendmmsg call, see batch.py
+    "sessions": 1,          # transfers to serve before exiting, 0 serves forever
+    "workers": 1,           # processes sharing the port (SO_REUSEPORT), needs sessions 0
+    "idle": 120.0,          # seconds of silence after which a session is dropped
+    "max-mss": wire.MAX_MSS,    # largest segment accepted from a sender
+    "rcvbuf": 0,            # socket receive buffer in bytes, 0 sizes it from max-mss
+    "compress": True,       # accept compressed payloads from senders that offer them
+    "fec": True,            # rebuild lost segments from senders' repair segments
+    "trace": False,         # print every response as it is sent
+    "metrics": "",          # file to append a JSON snapshot of the metrics to
+    "metrics-interval": 1.0,    # seconds between two snapshots
+    "metrics-listen": "",   # port or Unix socket path serving /metrics
+}
+
+# segments sent in one go before ACKs are looked at again
+BURST = 16
+# ACKs never carry data
+RECV_SIZE = 4096
+# MSS probing assumes a path carries segments this large, and tries every
+# size this often before giving up on it
+MIN_PROBE = 536
+PROBE_TRIES = 2
+
+# the receiver's socket buffer holds this many of the largest segments
+RCVBUF_SEGMENTS = 64
+
+# session counters summed up for the receiver's registry
+SESSION_COUNTERS = {
+    "bytesWritten": ("stp_receiver_bytes_total", "bytes written to output files"),
+    "dataSegments": ("stp_receiver_segments_total", "data segments received"),
+    "bitErrors": ("stp_receiver_bit_errors_total", "segments with a bad checksum"),
+    "dupPackets": ("stp_receiver_duplicates_total", "duplicate data segments"),
+    "dupAckPackets": ("stp_receiver_dup_acks_total", "duplicate ACKs sent"),
+    "recovered": ("stp_receiver_fec_recovered_total", "segments rebuilt from parity"),
+}
+
+# PLD settings, sender.py's positional arguments after gamma
+Faults = namedtuple("Faults", ["pDrop", "pDuplicate", "pCorrupt", "pOrder", \
+    "maxOrder", "pDelay", "maxDelay", "seed"], defaults=(0, 0, 0, 0, 0, 0, 0, 0))
+
+# bytes sent and seconds taken, per stream too when there were several
+Result = namedtuple("Result", ["size", "seconds", "streams"], defaults=((),))
+
+# defaults with options over them, unknown names are an error
+def settings(defaults, options):
+    options = dict(options or {})
+    unknown = [name for name in options if name not in defaults]
+    if(unknown):
+        raise ValueError("unknown option " + ", ".join(unknown))
+
+    return {**defaults, **options}
+
+def quiet(text):
+    pass
+
+def openLog(name, kind, suffix, start):
+    if(kind == "off"):
+        return logger.NullLog()
+    if(kind == "binary"):
+        return logger.EventLog(name + suffix + ".bin", start, binary=True)
+    return logger.EventLog(name + suffix + ".txt", start)
+
+class Sender:
+    def __init__(self, host, port, MWS, MSS, gamma=4, faults=Faults(), \
+            options=None, report=quiet):
+        self.host = host
+        self.port = port
+        self.MWS = MWS
+        self.MSS = MSS
+        self.gamma = gamma
+        self.faults = faults
+        self.options = settings(SENDER_OPTIONS, options)
+        self.report = report
+        if(self.options["cc"] not in cc.ALGORITHMS):
+            raise ValueError("unknown congestion control " + self.options["cc"])
+        compress.offer(self.options["compress"])
+        if(self.options["pld"] not in ("legacy", "numpy")):
+            raise ValueError("unknown PLD generator " + self.options["pld"])
+        if(self.options["pld"] == "numpy" and pld.numpy is None):
+            raise ValueError("--pld=numpy needs numpy installed")
+        try:
+            pacing.parse(self.options["pace"])
+        except ValueError:
+            raise ValueError("--pace takes off, auto or a positive rate in bytes/s")
+        if(self.options["resume"] and self.options["streams"] > 1):
+            raise ValueError("--resume needs a regular file sent over one stream")
+        repair = self.options["fec"]
+        if(repair not in ("off", "auto") and not (repair.isdigit() \
+                and fec.MIN_K <= int(repair) <= fec.MAX_K)):
+            raise ValueError("--fec takes off, auto or a K from " + \
+                str(fec.MIN_K) + " to " + str(fec.MAX_K))
+
+    # sends data over one connection, or a path over --streams of them
+    def send(self, data):
+        if(self.options["streams"] <= 1):
+            return self.connect().transfer(data)
+
+        # every stream is a whole connection of its own (socket, window, PLD
+        # seeded with seed + index, log) in its own process
+        if(not isinstance(data, (str, os.PathLike)) or data == "-"):
+            raise ValueError("--streams needs a regular file")
+        if(self.options["resume"]):
+            raise ValueError("--resume needs a regular file sent over one stream")
+        ranges = splitFile(data, self.options["streams"], self.MSS)
+        transferId = int.from_bytes(os.urandom(4), "big")
+        jobs = [(self, data, (transferId, index, len(ranges), start, end)) \
+            for index, (start, end) in enumerate(ranges)]
+        start = time.time()
+        with multiprocessing.Pool(len(jobs)) as pool:
+            results = pool.starmap(sendStream, jobs)
+
+        return Result(sum(result.size for result in results), \
+            time.time() - start, results)
+
+    # a connection for one transfer, or for one stream of a parallel one
+    def connect(self, stream=None):
+        return Connection(self, stream)
+
+# one stream of a parallel transfer, run in a worker process
+def sendStream(sender, path, stream):
+    faults = sender.faults._replace(seed=sender.faults.seed + stream[1])
+    sender = Sender(sender.host, sender.port, sender.MWS, sender.MSS, \
+        sender.gamma, faults, sender.options, sender.report)
+    return sender.connect(stream).transfer(path, stream[3], stream[4])
+
+# [start, end) ranges of about the same size, cut on MSS boundaries
+def splitFile(path, count, MSS):
+    size = os.path.getsize(path)
+    step = -(-size // count)
+    step += -step % MSS
+    ranges = [(start, min(start + step, size)) for start in range(0, size, step or 1)]
+
+    return ranges or [(0, 0)]
+
+class Connection:
+    # stream is (transfer id, index, count, start, end) when this connection
+    # carries one stream of a parallel transfer
+    def __init__(self, sender, stream=None):
+        self.host = sender.host
+        self.port = sender.port
+        self.MWS = sender.MWS
+        self.MSS = sender.MSS
+        self.options = options = sender.options
+        self.report = sender.report
+        self.stream = stream
+        self.suffix = suffix = "" if stream is None else "." + str(stream[1])
+        # the debug prints, off unless --trace is given
+        self.tracing = options["trace"]
+        # tells our segments apart from other senders' at a shared receiver
+        self.connId = int.from_bytes(os.urandom(4), "big") or 1
+
+        # every timer of the connection's event loop, see timers.py
+        self.wheel = TimerWheel()
+        # round trip estimate and retransmission timeout, see rtt.py
+        self.rtt = RttEstimator(sender.gamma)
+        # congestion window (cc.py), pacing (pacing.py), the segments in
+        # flight (window.py) and the timer for the oldest of them
+        self.congestion = None
+        self.pacer = None
+        self.sendWindow = None
+        self.rtoTimer = None
+
+        # what the handshake agreed on: wire version, the largest segment
+        # the receiver takes (0 if it predates MSS negotiation), the payload
+        # codec and its stage (compress.py), the repair segment encoder
+        # (fec.py) and what the receiver kept of an earlier attempt
+        self.peerVersion = wire.VERSION_PICKLE
+        self.peerMss = 0
+        self.codec = None
+        self.compressor = None
+        self.fecEncoder = None
+        self.held = []
+
+        self.createStats()
+
+        # connected so that a burst needs no destination per datagram
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.connect((self.host, self.port))
+        # datagrams waiting to go out together, see batch.py
+        self.outbox = Batch(self.sock, options["sendmmsg"])
+
+        self.start = time.time()
+        self.eventLog = openLog("Sender_log", options["log"], suffix, self.start)
+        self.ccTrace = open(options["cc-trace"] + suffix, 'w') \
+            if options["cc-trace"] else None
+
+        # every PLD decision is drawn from the seed up front, or replayed
+        faults = sender.faults
+        if(options["pld-replay"]):
+            self.schedule = pld.load(options["pld-replay"] + suffix)
+        else:
+            self.schedule = pld.Schedule(faults.pDrop, faults.pDuplicate, \
+                faults.pCorrupt, faults.pOrder, faults.pDelay, faults.maxDelay, \
+                faults.seed, options["pld"])
+        self.faults = pld.PLD(self.schedule, faults.maxOrder, self.send, \
+            self.logTime, self.wheel, lambda: self.rtt.timeout / 2)
+
+        self.dumper = None
+        if(options["metrics"]):
+            self.dumper = metrics.Dumper(self.stats, options["metrics"] + suffix, \
+                options["metrics-interval"], self.wheel)
+        self.server = None
+        if(options["metrics-listen"]):
+            where = options["metrics-listen"]
+            # every stream serves its own registry
+            if(stream is not None):
+                where = str(int(where) + stream[1]) if where.isdigit() else where + suffix
+            self.server = metrics.serve(self.stats, where)
+
+    # every statistic of the transfer, see metrics.py, the log file summary
+    # is written from the same counters
+    def createStats(self):
+        stats = self.stats = metrics.Registry()
+        self.fileSize = stats.counter("stp_sender_bytes_total", "bytes of the file sent")
+        self.transmitted = stats.counter("stp_sender_segments_total", \
+            "data segments handed to PLD, retransmissions included")
+        # the log has always reported every retransmission as a dropped segment
+        self.dropped = stats.counter("stp_sender_retransmissions_total", \
+            "segments sent again")
+        self.timeouts = stats.counter("stp_sender_timeouts_total", \
+            "retransmission timeouts")
+        self.fastRetrans = stats.counter("stp_sender_fast_retransmits_total", \
+            "segments resent on duplicate ACKs or SACK holes")
+        self.totalDupAcks = stats.counter("stp_sender_dup_acks_total", \
+            "duplicate ACKs received")
+        self.rttSamples = stats.histogram("stp_sender_rtt_seconds", \
+            "round trip time samples")
+        self.ackGaps = stats.histogram("stp_sender_ack_interarrival_seconds", \
+            "time between two ACKs")
+
+        # what the protocol keeps anyway is only read when a snapshot is taken
+        stats.gauge("stp_sender_cwnd_bytes", "congestion window", \
+            lambda: self.congestion.window() if self.congestion is not None else 0)
+        stats.gauge("stp_sender_in_flight_bytes", "bytes sent and not acked yet", \
+            lambda: self.sendWindow.inFlightBytes if self.sendWindow is not None else 0)
+        stats.gauge("stp_sender_rto_seconds", "retransmission timeout", \
+            lambda: self.rtt.timeout)
+        stats.counter("stp_sender_wire_payload_bytes_total", \
+            "payload bytes put on the wire, after compression", \
+            lambda: self.compressor.wireBytes if self.compressor is not None else 0)
+        stats.counter("stp_sender_fec_repairs_total", "repair segments sent", \
+            lambda: self.fecEncoder.repairs if self.fecEncoder is not None else 0)
+        stats.gauge("stp_sender_pacing_rate_bytes", "pacing rate, 0 when not paced", \
+            lambda: self.pacer.rate if self.pacer is not None else 0)
+        stats.counter("stp_sender_pacing_waits_total", "times the pacer held data back", \
+            lambda: self.pacer.waits if self.pacer is not None else 0)
+        for name in ("dropped", "duplicated", "corrupted", "reOrdered", "delayed"):
+            stats.counter("stp_pld_" + name.lower() + "_total", "segments PLD " + \
+                name.lower(), lambda name=name: getattr(self.faults, name, 0))
+
+    # sends data (anything source.asSource() takes, or its [start, end)
+    # range) and closes the connection, returns the bytes sent and the
+    # seconds it took
+    def transfer(self, data, start=0, end=None):
+        key = None
+        if(self.options["resume"]):
+            if(not isinstance(data, (str, os.PathLike)) or data == "-"):
+                raise ValueError("--resume needs a regular file sent over one stream")
+            key = manifest.resumeKey(data)
+        self.open(key, data)
+        source = asSource(data, start, end)
+        try:
+            res = self.transmit(source)
+        finally:
+            source.close()
+        self.close(res[0], res[1])
+
+        return Result(self.fileSize.value, time.time() - self.start)
+
+    # the handshake, resume is the key of the file at path to pick up again
+    def open(self, resume=None, path=None):
+        options = self.options
+        repairK = None
+        if(options["fec"] != "off"):
+            repairK = 0 if options["fec"] == "auto" else int(options["fec"])
+
+        # the segment size is only known once the receiver has had its say
+        requested = self.MSS
+        self.MSS = self.handshake(self.MSS, compress.offer(options["compress"]), \
+            resume, repairK)
+        if(self.held):
+            self.report("Resuming: the receiver holds " + str(sum(end - start \
+                for start, end in self.held)) + " of " + str(os.path.getsize(path)) + \
+                " bytes")
+        if(options["mss-probe"] and self.peerMss):
+            self.MSS = self.probeMss(self.MSS)
+        if(self.MSS != requested):
+            self.report("MSS " + str(requested) + " lowered to " + str(self.MSS))
+        mtu.setBuffers(self.sock, send=options["sndbuf"] or \
+            self.MWS + BURST * wire.datagramSize(self.MSS))
+        self.congestion = cc.create(options["cc"], self.MSS, self.MWS, \
+            self.ccTrace, self.start)
+        rate = pacing.parse(options["pace"])
+        self.pacer = pacing.Pacer(self.MSS, rate) if rate is not None else None
+
+    # the teardown, the log summary and whatever else the connection holds
+    def close(self, seqNum, ackNum):
+        self.teardown(seqNum, ackNum)
+        self.logStats()
+        if(self.codec is not None):
+            self.report("Compressed with " + self.codec.name + ": " + \
+                str(self.compressor.wireBytes) + " of " + str(self.compressor.rawBytes) + \
+                " bytes sent, " + str(self.compressor.compressed) + " of " + \
+                str(self.compressor.tried) + " segments tried shrank")
+        if(self.fecEncoder is not None):
+            self.report("FEC: " + str(self.fecEncoder.repairs) + \
+                " repair segments sent, " + str(self.fecEncoder.recovered) + \
+                " segments rebuilt by the receiver")
+        if(self.dumper is not None):
+            self.dumper.close()
+        if(self.server is not None):
+            self.server.shutdown()
+        if(self.ccTrace is not None):
+            self.ccTrace.close()
+        if(self.options["pld-export"]):
+            self.schedule.export(self.options["pld-export"] + self.suffix, \
+                self.schedule.position)
+
+    def logTime(self, packet, type, symbol):
+        self.eventLog.record(packet, type, symbol)
+
+    def send(self, packet):
+        # data segments carry the moment they leave so that every ACK can echo
+        # it back as an RTT sample of exactly that transmission
+        options = None
+        if(self.peerVersion > wire.VERSION_PICKLE and len(packet) == 6):
+            options = wire.timestamp(wire.stamp(time.monotonic()))
+        # a compressed payload is always shorter than the data it covers
+        flags = 0
+        if(self.codec is not None and len(packet) == 6 and packet[1] != len(packet[5])):
+            flags = wire.FLAG_COMPRESSED
+        self.outbox.add(wire.encode(packet, self.peerVersion, self.connId, flags, \
+            options))
+
+    # packet, wire version and options of the next datagram
+    def receive(self):
+        packet, version, flags, connId, options = \
+            wire.decode(self.sock.recvfrom(RECV_SIZE)[0])
+        return packet, version, options
+
+    # RTT sample from the timestamp an ACK echoes, False if it carries none
+    def sampleEcho(self, options):
+        echo = options.get(wire.OPT_TIMESTAMP)
+        if(echo is None):
+            return False
+
+        self.sampleRtt(wire.elapsed(echo[1], time.monotonic()))
+        return True
+
+    def sampleRtt(self, sample):
+        self.rtt.sample(sample)
+        self.rttSamples.observe(sample)
+
+    # returns the MSS agreed with the receiver, codecs are the payload codecs
+    # to offer, resume the key of a transfer to pick up again and repairK the
+    # FEC block size (0 adapts it, None sends no repair segments)
+    def handshake(self, MSS, codecs=(), resume=None, repairK=None):
+        sock = self.sock
+        # the Syn is always pickled so that old receivers can still read it,
+        # it advertises our wire version and connection id and the Synack
+        # tells us what was agreed on, its echoed timestamp gives the first
+        # RTT sample
+        sock.settimeout(self.rtt.timeout)
+        while True:
+            options = {**wire.timestamp(wire.stamp(time.monotonic())), \
+                **wire.connection(self.connId), **wire.mss(min(MSS, wire.MAX_MSS))}
+            if(codecs):
+                options.update(wire.compression(codecs))
+            if(resume is not None):
+                options.update(wire.resume(resume))
+            if(repairK is not None):
+                options.update(wire.fec())
+            if(self.stream is not None):
+                options.update(wire.stream(*self.stream[:4]))
+            advert = wire.advertise(options)
+            list = newPacket("Syn", 0, 0, 0, 0, advert)
+            self.outbox.add(wire.encode(list, wire.VERSION_PICKLE))
+            self.outbox.flush()
+            self.logTime(list, "snd", "S")
+            try:
+                response, version, options = self.receive()
+                break
+            except ConnectionRefusedError:
+                # nobody listens there yet, wait as long as for a lost Syn
+                time.sleep(self.rtt.timeout)
+            except socket.timeout:
+                pass
+            # a busy receiver drops datagrams too, the Syn among them
+            self.rtt.backoff()
+            sock.settimeout(self.rtt.timeout)
+        sock.settimeout(None)
+        self.peerVersion = version
+        self.peerMss = wire.readMss(options)
+        self.codec = compress.choose(wire.readCompression(options))
+        self.held = wire.readRanges(options)
+        if(repairK is not None and wire.readFec(options) is not None):
+            # resends are the losses parity did not cover
+            self.fecEncoder = fec.Encoder(repairK, \
+                lambda: self.fastRetrans.value + self.timeouts.value)
+        self.sampleEcho(options)
+        self.logTime(response, "rcv", "SA")
+
+        list = newPacket("Ack", 0, 0, 1, 1)
+        self.send(list)
+        self.outbox.flush()
+        self.logTime(list, "snd", "A")
+
+        # a receiver that doesn't negotiate reads at most 4096 bytes at a time
+        MSS = min(MSS, self.peerMss or wire.LEGACY_MSS)
+        if(self.fecEncoder is not None):
+            # a repair segment lists its block on top of the largest payload
+            MSS = min(MSS, wire.MAX_MSS - fec.HEADROOM)
+        return MSS
+
+    # the largest segment up to MSS that reaches the receiver whole, a binary
+    # search over padded Probe segments sent with fragmentation forbidden
+    def probeMss(self, MSS):
+        previous = mtu.forbidFragments(self.sock)
+        known = mtu.pathMtu(self.sock)
+        high = MSS if known is None else min(MSS, mtu.mssFor(known))
+        # most paths carry the largest candidate
+        if(not self.probe(high)):
+            best = min(MIN_PROBE, high)
+            low = best + 1
+            high -= 1
+            while(low <= high):
+                middle = (low + high) // 2
+                if(self.probe(middle)):
+                    best = middle
+                    low = middle + 1
+                else:
+                    high = middle - 1
+            high = best
+        mtu.allowFragments(self.sock, previous)
+
+        return high
+
+    # True once the receiver says a Probe padded to size arrived whole
+    def probe(self, size):
+        sock = self.sock
+        packet = newPacket("Probe", size, 0, 0, 0, bytes(size))
+        data = wire.encode(packet, self.peerVersion, self.connId, \
+            options=wire.timestamp(wire.stamp(time.monotonic())))
+        for attempt in range(PROBE_TRIES):
+            if(not mtu.sendWhole(sock, data)):
+                return False
+            deadline = time.monotonic() + self.rtt.timeout
+            try:
+                while True:
+                    sock.settimeout(max(deadline - time.monotonic(), 0.001))
+                    response = self.receive()[0]
+                    if(getType(response) == "Probe" and getLastAck(response) == size):
+                        return True
+            except (socket.timeout, ConnectionRefusedError):
+                continue
+            finally:
+                sock.settimeout(None)
+
+        return False
+
+    def teardown(self, seqNum, ackNum):
+        sock = self.sock
+        packet = newPacket("Fin", 0, 0, seqNum, ackNum)
+        self.send(packet)
+        self.outbox.flush()
+        self.logTime(packet, "snd", "F")
+        if(self.tracing):
+            print(packet)
+
+        # the Fin goes again until the receiver's own Fin shows up
+        sock.settimeout(self.rtt.timeout)
+        while True:
+            try:
+                response = self.receive()[0]
+            except ConnectionRefusedError:
+                # the receiver is gone for now, resend as if the Fin was lost
+                time.sleep(self.rtt.timeout)
+                response = None
+            except socket.timeout:
+                response = None
+            if(response is None):
+                self.rtt.backoff()
+                sock.settimeout(self.rtt.timeout)
+                self.send(packet)
+                self.outbox.flush()
+                self.logTime(packet, "snd", "F")
+                continue
+            if(getType(response) == "Fin"):
+                break
+            self.logTime(response, "rcv", "A")
+        sock.settimeout(None)
+
+        self.logTime(response, "rcv", "F")
+        seq = getLastAck(response)
+        ack = getLastSeq(response)
+        packet = newPacket("Ack", 0, 0, seq, ack + 1)
+        self.send(packet)
+        self.outbox.flush()
+        self.logTime(packet, "snd", "A")
+        if(self.tracing):
+            print(packet)
+
+        self.report("Closing Socket!")
+        sock.close()
+
+    def retransmit(self, segment, ackNum):
+        segment.sentAt = time.monotonic()
+        segment.retransmits += 1
+        segment.recovered = True
+        packet = newPacket("Rxt", len(segment), segment.chkSum, segment.seq, \
+            ackNum, segment.chunk)
+        self.faults(packet, "Rxt")
+        self.transmitted.inc()
+        self.dropped.inc()
+
+        return packet
+
+    # resends every hole the SACK scoreboard shows that hasn't been resent
+    # yet, returns how many that was
+    def recoverLost(self, ackNum):
+        resent = 0
+        for segment in self.sendWindow.lost():
+            if(not segment.recovered):
+                self.retransmit(segment, ackNum)
+                if(self.tracing):
+                    print("Retransmitted hole: " + str(segment.seq))
+                resent += 1
+
+        return resent
+
+    # a repair segment from fec.Encoder, if it had one, goes through PLD too
+    def sendRepair(self, repair, ackNum):
+        if(repair is None):
+            return
+
+        seq, payload = repair
+        self.faults(newPacket("Fec", len(payload), checkSum(payload), seq, ackNum, \
+            payload), "Fec")
+
+    def restartTimer(self):
+        # each segment gets a whole timeout from its own (re)transmission
+        if(self.rtoTimer is not None):
+            self.rtoTimer.cancel()
+        delay = self.sendWindow.first().sentAt + self.rtt.timeout - time.monotonic()
+        self.rtoTimer = self.wheel.schedule(max(delay, 0), self.onTimeout)
+
+    def onTimeout(self):
+        sendWindow = self.sendWindow
+        self.rtoTimer = None
+        if(not sendWindow):
+            return
+
+        if(self.tracing):
+            print("TIMEOUT")
+        # the oldest segment and every known hole behind it, holes resent
+        # earlier may have been lost again
+        for segment in sendWindow.lost():
+            segment.recovered = False
+        self.retransmit(sendWindow.first(), 1)
+        if(self.tracing):
+            print("Resent packet: " + str(sendWindow.first().seq))
+        self.timeouts.inc()
+        self.recoverLost(1)
+        self.rtt.backoff()
+        self.congestion.onTimeout(sendWindow.inFlightBytes, sendWindow.end - 1)
+
+        self.restartTimer()
+
+    # MWS bounds what is unacked, the congestion window what is in the network
+    def canSend(self):
+        return self.sendWindow.inFlightBytes < self.MWS and \
+            self.sendWindow.pipe < self.congestion.window()
+
+    # sends everything source holds, returns the sequence and ack numbers
+    # the Fin goes out with
+    def transmit(self, source):
+        sock = self.sock
+        wheel = self.wheel
+        outbox = self.outbox
+        rtt = self.rtt
+        congestion = self.congestion
+        pacer = self.pacer
+        fecEncoder = self.fecEncoder
+        # chunks are views into the mapped file or, with a codec agreed,
+        # compressed copies of them that cover length bytes of it, seqNum
+        # jumps over whatever the receiver already holds
+        compressor = self.compressor = compress.Pipeline(source, self.MSS, \
+            self.codec, self.options["compress-level"], \
+            self.options["compress-workers"], held=self.held)
+        chunk, length, position = compressor.read()
+        count = 0
+        seqNum = position + 1
+        ackNum = 1
+        prevAck = 1
+        ackDups = 1
+        lastAckAt = None
+        # only the unacked segments are kept, see window.py
+        sendWindow = self.sendWindow = SendWindow()
+
+        # ACKs, retransmission timeouts and PLD releases are all driven from
+        # one event loop, the socket never blocks
+        sock.setblocking(False)
+        selector = selectors.DefaultSelector()
+        selector.register(sock, selectors.EVENT_READ)
+
+        while(chunk or sendWindow):
+            # send at most BURST new segments before looking at ACKs again,
+            # and none before the pacer lets them
+            burst = 0
+            while(chunk and self.canSend() and burst < BURST and \
+                    (pacer is None or pacer.ready())):
+                chkSum = checkSum(chunk)
+                # keep the checksum so retransmits never hash the chunk again
+                sendWindow.push(seqNum, chunk, chkSum, length)
+                self.fileSize.inc(length)
+                self.transmitted.inc()
+                if(self.tracing):
+                    print("THE TIMER IS: " + str(rtt.timeout))
+                packet = newPacket("Psh", length, chkSum, seqNum, ackNum, chunk)
+                self.faults(packet, "Psh")
+                if(pacer is not None):
+                    pacer.consume(len(chunk) + wire.DATA_OVERHEAD)
+                # start the timer for timeout
+                if(self.rtoTimer is None):
+                    self.restartTimer()
+
+                if(fecEncoder is not None):
+                    self.sendRepair(fecEncoder.add(seqNum, length, compressor.raw), \
+                        ackNum)
+
+                count += 1
+                burst += 1
+                chunk, length, position = compressor.read()
+                seqNum = position + 1
+                if(not chunk and fecEncoder is not None):
+                    # the tail of the file would otherwise only have timeouts
+                    self.sendRepair(fecEncoder.flush(), ackNum)
+
+            # the whole burst (and anything timers queued) leaves in one call
+            outbox.flush()
+
+            # only sleep when there is nothing left we are allowed to send
+            wait = 0
+            fine = False
+            if(not chunk or not self.canSend()):
+                wait = wheel.nextDeadline()
+                # the socket buffer was full, try again shortly
+                if(outbox and (wait is None or wait > 0.001)):
+                    wait = 0.001
+            elif(pacer is not None and not pacer.ready()):
+                # the window has room, the pacer says when the next one leaves
+                wait = pacer.delay()
+                deadline = wheel.nextDeadline()
+                if(deadline is not None and deadline < wait):
+                    wait = deadline
+                fine = wait < pacing.FINE
+
+            # epoll sleeps in whole milliseconds, a shorter gap is only polled
+            # for ACKs and then slept here
+            if(selector.select(0 if fine else wait)):
+                while True:
+                    try:
+                        response, version, options = self.receive()
+                    except BlockingIOError:
+                        break
+                    except ConnectionRefusedError:
+                        # the receiver went away, the timer keeps resending
+                        # until it is back
+                        continue
+                    # a late Probe answer or a repeated Synack acknowledges
+                    # no data and its echo times no segment
+                    if(getType(response) in ("Probe", "Synack")):
+                        continue
+                    now = time.monotonic()
+                    if(lastAckAt is not None):
+                        self.ackGaps.observe(now - lastAckAt)
+                    lastAckAt = now
+
+                    echoed = self.sampleEcho(options)
+                    recovered = wire.readFec(options)
+                    if(recovered and fecEncoder is not None):
+                        fecEncoder.report(recovered)
+                    blocks = options.get(wire.OPT_SACK)
+                    if(blocks is not None):
+                        for start, end in wire.readSack(blocks):
+                            sendWindow.sack(start, end)
+
+                    if(getType(response) == "DupAck"):
+                        ackDups += 1
+                        self.totalDupAcks.inc()
+                        self.logTime(response, "rcv/DA", "A")
+                    elif(getType(response) == "Ack" and getLastAck(response) >= prevAck):
+                        if(ackDups > 1):
+                            ackDups = 1
+                        # slide the window, acked segments are freed right away
+                        tmp = sendWindow.ack(getLastAck(response))
+                        congestion.onAck(getLastAck(response) - prevAck, \
+                            getLastAck(response), sendWindow.inFlightBytes, \
+                            rtt.estimatedRTT)
+                        prevAck = getLastAck(response)
+                        source.release(prevAck - 1)
+
+                        # without timestamps only a segment that was sent once
+                        # gives an unambiguous sample (Karn)
+                        newest = sendWindow.lastAcked
+                        if(not echoed and newest is not None and \
+                                newest.end == prevAck and not newest.retransmits):
+                            self.sampleRtt(time.monotonic() - newest.sentAt)
+
+                        if(sendWindow):
+                            self.restartTimer()
+
+                        if(self.tracing):
+                            print("Window slid " + str(tmp) + " packets!")
+                        self.logTime(response, "rcv", "A")
+
+                    if(self.peerVersion > wire.VERSION_PICKLE):
+                        # SACK: resend every hole as soon as it shows up
+                        resent = self.recoverLost(ackNum)
+                        if(resent):
+                            self.fastRetrans.inc(resent)
+                            congestion.onLoss(sendWindow.inFlightBytes, seqNum - 1)
+                            self.restartTimer()
+                    elif(ackDups == 4 and sendWindow):
+                        self.retransmit(sendWindow.first(), ackNum)
+                        self.restartTimer()
+                        if(self.tracing):
+                            print("Retrasnmitted packet: " + str(prevAck))
+                        self.fastRetrans.inc()
+                        congestion.onLoss(sendWindow.inFlightBytes, seqNum - 1)
+
+                if(pacer is not None):
+                    pacer.update(congestion.window(), rtt.estimatedRTT, \
+                        congestion.cwnd < congestion.ssthresh)
+            elif(fine):
+                time.sleep(wait)
+
+            wheel.advance()
+
+        # whatever PLD still holds back is of no use to the receiver anymore
+        self.faults.cancel()
+        if(self.rtoTimer is not None):
+            self.rtoTimer.cancel()
+        selector.close()
+        outbox.flush()
+        sock.setblocking(True)
+        compressor.close()
+        return [seqNum, ackNum]
+
+    def logStats(self):
+        faults = self.faults
+        res = "============================================================="
+        res += "\nSize of the file (in Bytes)                      " + str(self.fileSize.value)
+        # a duplicate is one more segment on the wire
+        sent = self.transmitted.value + faults.duplicated
+        res += "\nSegments transmitted (including drop & RXT)      " + str(sent + 4)
+        res += "\nNumber of Segments handled by PLD                " + str(sent)
+        res += "\nNumber of Segments dropped                       " + str(self.dropped.value)
+        res += "\nNumber of Segments Corrupted                     " + str(faults.corrupted)
+        res += "\nNumber of Segments Re-ordered                    " + str(faults.reOrdered)
+        res += "\nNumber of Segments Duplicated                    " + str(faults.duplicated)
+        res += "\nNumber of Segments Delayed                       " + str(faults.delayed)
+        res += "\nNumber of Retransmissions due to TIMEOUT         " + str(self.timeouts.value)
+        res += "\nNumber of FAST RETRANSMISION                     " + str(self.fastRetrans.value)
+        res += "\nNumber of DUP ACKS RECEIVED                      " + str(self.totalDupAcks.value)
+        res += "\n============================================================="
+
+        # lands after every buffered event
+        self.eventLog.write(res)
+        self.eventLog.close()
+
+class Receiver:
+    # sink is a path (outputs are named after it, see outputName()), or a
+    # writable object or a callback taking each piece of data in order for a
+    # single transfer. sinkFactory instead takes the sender's address and
+    # connection id and returns a writable for each transfer, which gets
+    # close() once that transfer is complete, or abort() (close() if it has
+    # none) when it is dropped before that.
+    def __init__(self, port, sink="out.bin", options=None, worker=0, \
+            host="127.0.0.1", report=quiet, sinkFactory=None):
+        self.options = options = settings(RECEIVER_OPTIONS, options)
+        if(sinkFactory is not None):
+            if(not accepts(sinkFactory, ("127.0.0.1", 0), 0)):
+                raise ValueError("sinkFactory must take an address and a connection id")
+        elif(not isinstance(sink, (str, os.PathLike))):
+            if(not hasattr(sink, "write") and not accepts(sink, b"")):
+                raise ValueError("sink must be a path, a writable or a callable " + \
+                    "taking the data")
+            if(options["sessions"] != 1):
+                raise ValueError("a writable or callable sink takes one transfer, " + \
+                    "more need a sinkFactory")
+        self.sink = sink
+        self.sinkFactory = sinkFactory
+        self.worker = worker
+        self.report = report
+        # transfers started and ended by this receiver
+        self.started = 0
+        self.ended = 0
+
+        self.sock = sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        if(options["workers"] > 1):
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        sock.bind((host, port))
+        # a pickled segment from an old sender still needs its 4096 bytes, a
+        # repair segment lists the segments it covers on top of their payload
+        self.maxMss = min(options["max-mss"], wire.MAX_MSS)
+        self.recvSize = max(wire.datagramSize(self.maxMss + fec.HEADROOM), 4096)
+        mtu.setBuffers(sock, receive=options["rcvbuf"] or \
+            RCVBUF_SEGMENTS * self.recvSize)
+        # every datagram is read into the same buffer, sessions are done
+        # with a payload (see session.py) before the next one arrives
+        self.buffer = memoryview(bytearray(self.recvSize))
+        self.start = time.time()
+        self.eventLog = openLog("Receiver_log", options["log"], "" if \
+            options["workers"] <= 1 else "." + str(worker), self.start)
+
+        # every ready datagram is handled before any response goes out, and
+        # the responses leave together in one batch
+        sock.setblocking(False)
+        self.selector = selectors.DefaultSelector()
+        self.selector.register(sock, selectors.EVENT_READ)
+        self.outbox = Batch(sock, options["sendmmsg"])
+        self.wheel = TimerWheel()
+
+        # one Session per (address, connection id), and the transfers that
+        # are sent over several streams by (host, transfer id) or resumed by
+        # key, see session.py
+        self.sessions = {}
+        self.transfers = {}
+        if(options["idle"] > 0):
+            self.wheel.schedule(options["idle"], self.expire)
+
+        # every statistic of this receiver, see metrics.py, and the per
+        # session counts of the sessions that already finished
+        self.totals = {}
+        self.createStats(worker if options["workers"] > 1 else None)
+        self.dumper = None
+        if(options["metrics"]):
+            self.dumper = metrics.Dumper(self.stats, self.workerName( \
+                options["metrics"]), options["metrics-interval"], self.wheel)
+        self.server = None
+        if(options["metrics-listen"]):
+            where = options["metrics-listen"]
+            # every worker serves its own registry
+            if(where.isdigit()):
+                where = str(int(where) + worker)
+            else:
+                where = self.workerName(where)
+            self.server = metrics.serve(self.stats, where)
+
+    def createStats(self, worker):
+        stats = self.stats = metrics.Registry({} if worker is None else {"worker": worker})
+        stats.counter("stp_receiver_transfers_started_total", "transfers opened", \
+            lambda: self.started)
+        stats.counter("stp_receiver_transfers_ended_total", "transfers completed", \
+            lambda: self.ended)
+        stats.gauge("stp_receiver_sessions", "sessions open right now", \
+            lambda: len(self.sessions))
+        stats.counter("stp_receiver_socket_drops_total", \
+            "datagrams dropped for a full socket buffer", \
+            lambda: mtu.socketDrops(self.sock) or 0)
+        self.malformed = stats.counter("stp_receiver_malformed_total", \
+            "datagrams dropped for not being a well formed segment")
+        # nothing extra on the hot path, the sessions count for themselves
+        for attribute, (name, help) in SESSION_COUNTERS.items():
+            stats.counter(name, help, lambda attribute=attribute: \
+                self.totals.get(attribute, 0) + sum(getattr(session, attribute) \
+                for session in list(self.sessions.values())))
+
+    # serves until --sessions transfers have ended, then closes
+    def serve(self):
+        limit = self.options["sessions"]
+        try:
+            while(not limit or self.ended < limit):
+                self.poll(self.wheel.nextDeadline())
+        finally:
+            self.close()
+
+    # handles whatever arrives within timeout seconds
+    def poll(self, timeout=None):
+        sock = self.sock
+        self.selector.select(timeout)
+        while True:
+            try:
+                size, address = sock.recvfrom_into(self.buffer)
+            except BlockingIOError:
+                break
+            # whatever isn't a well formed segment is counted and dropped
+            try:
+                self.receive(self.buffer[:size], address)
+            except wire.MALFORMED as error:
+                self.malformed.inc()
+                if(self.options["trace"]):
+                    print("Dropping malformed datagram from " + str(address) + ": " + \
+                        str(error))
+
+        self.wheel.advance()
+        self.outbox.flush()
+
+    def receive(self, data, address):
+        list, version, flags, connId, options = wire.decode(data)
+
+        # a pickled Syn carries its connection id as an option
+        synOptions = options
+        if(list[0] == "Syn" and version == wire.VERSION_PICKLE):
+            synOptions = wire.advertised(list[5] if len(list) == 6 else b"")[1]
+            connId = wire.readConnection(synOptions)
+
+        key = (address, connId)
+        session = self.sessions.get(key)
+        if(session is None):
+            if(list[0] != "Syn"):
+                if(self.options["trace"]):
+                    print("No session for " + str(list[0]) + " from " + str(address))
+                return
+            session = self.openSession(address, connId, synOptions)
+            if(session is None):
+                self.report("Refusing Syn from " + str(address))
+                return
+        elif(version != session.peerVersion and list[0] != "Syn"):
+            # a sender sticks to the format agreed in its handshake, only
+            # its Syn goes again pickled
+            if(self.options["trace"]):
+                print("Wrong format for " + str(list[0]) + " from " + str(address))
+            return
+
+        session.handle(list, version, flags, options)
+        if(session.state == CLOSED):
+            self.finish(session)
+
+    def close(self):
+        self.report("Closing Socket!")
+        drops = mtu.socketDrops(self.sock)
+        if(drops):
+            self.report("Datagrams dropped by a full socket buffer: " + str(drops))
+        if(self.malformed.value):
+            self.report("Malformed datagrams dropped: " + str(self.malformed.value))
+        # the last snapshot still reads the socket's drop counter
+        if(self.dumper is not None):
+            self.dumper.close()
+        if(self.server is not None):
+            self.server.shutdown()
+        self.selector.close()
+        self.sock.close()
+        self.eventLog.close()
+
+    # a session for a new Syn, None once the receiver has served its limit
+    def openSession(self, address, connId, synOptions):
+        options = self.options
+        sessions = self.sessions
+        transfers = self.transfers
+        toFile = self.sinkFactory is None and isinstance(self.sink, (str, os.PathLike))
+
+        # streams of one parallel transfer share its output file
+        stream = wire.readStream(synOptions)
+        # only a file can be picked up where it was left
+        resume = wire.readResume(synOptions) if toFile else None
+        transfer = None
+        offset = 0
+        count = 1
+        if(stream is not None):
+            if(not toFile):
+                return None
+            transferId, index, count, offset = stream
+            transfer = transfers.get((address[0], transferId))
+        elif(resume is not None):
+            # the sender came back before its old session went idle, the new
+            # one carries on from everything the old one got
+            transfer = transfers.get(resume)
+            for old in [s for s in sessions.values() if s.transfer is transfer]:
+                del sessions[(old.address, old.connId)]
+                old.detach()
+                self.retire(old)
+
+        if(transfer is None):
+            limit = options["sessions"]
+            if(limit and self.started >= limit):
+                return None
+            if(self.sinkFactory is not None):
+                target = self.sinkFactory(address, connId)
+                transfer = Transfer(repr(target), output=StreamWriter(target.write), \
+                    ended=lambda complete, target=target: endSink(target, complete))
+            elif(not toFile):
+                deliver = self.sink.write if hasattr(self.sink, "write") else self.sink
+                transfer = Transfer(repr(self.sink), output=StreamWriter(deliver))
+            elif(stream is not None and options["workers"] > 1):
+                # streams may land on different workers, they all open the
+                # same file by transfer id and only ever write their own ranges
+                root, ext = os.path.splitext(os.fspath(self.sink))
+                transfer = Transfer(root + "." + format(transferId, "08x") + ext, \
+                    count, shared=True)
+            elif(resume is not None):
+                transfer = self.resumable(resume)
+                transfers[resume] = transfer
+            else:
+                transfer = Transfer(self.outputName(self.started), count)
+            if(stream is not None):
+                transfers[(address[0], transferId)] = transfer
+            self.started += 1
+
+        session = Session(address, connId, transfer, self.outbox, self.wheel, \
+            self.logTime, options["ack-delay"], options["ack-every"], offset, \
+            options["trace"], self.maxMss, options["compress"], options["fec"])
+        sessions[(address, connId)] = session
+
+        return session
+
+    # ends a session and writes its summary to the log, a transfer ends with
+    # the last of its streams
+    def finish(self, session):
+        del self.sessions[(session.address, session.connId)]
+        session.close()
+        self.retire(session)
+        transfer = session.transfer
+        if(transfer.closed):
+            self.ended += 1
+            for key in [key for key, value in self.transfers.items() if value is transfer]:
+                del self.transfers[key]
+
+        res = session.stats()
+        if(self.options["sessions"] != 1 or transfer.streams > 1):
+            res = "Session " + session.address[0] + ":" + str(session.address[1]) + \
+                " -> " + transfer.path + "\n" + res
+        # lands after every buffered event
+        self.eventLog.write(res)
+
+    # keeps the counts of a session that is gone
+    def retire(self, session):
+        self.outbox.forget(session.address)
+        for attribute in SESSION_COUNTERS:
+            self.totals[attribute] = self.totals.get(attribute, 0) + \
+                getattr(session, attribute)
+
+    # a transfer the sender can pick up again, with what an earlier attempt
+    # left on disk. Its output is named by key unless this receiver only
+    # ever serves the one transfer, so that a later Syn with the same key
+    # finds it.
+    def resumable(self, key):
+        path = os.fspath(self.sink)
+        if(self.options["sessions"] != 1 or self.options["workers"] > 1):
+            root, ext = os.path.splitext(path)
+            path = root + "." + key.hex() + ext
+        record = manifest.load(path + ".manifest", key)
+        if(record is None or not os.path.exists(path)):
+            return Transfer(path, manifest=manifest.Manifest(path + ".manifest", key))
+
+        transfer = Transfer(path, manifest=record)
+        dropped = record.verify(transfer.output.fd)
+        self.report("Resuming " + path + ": " + str(record.held()) + " bytes kept" + \
+            (", " + str(dropped) + " failed verification" if dropped else ""))
+        return transfer
+
+    # drops sessions whose sender went quiet, checked every idle seconds
+    def expire(self):
+        idle = self.options["idle"]
+        now = time.monotonic()
+        for session in [s for s in self.sessions.values() if now - s.lastSeen > idle]:
+            self.report("Dropping idle session from " + str(session.address))
+            self.finish(session)
+        self.wheel.schedule(idle, self.expire)
+
+    # a single transfer keeps the given name, more get numbered copies of it
+    def outputName(self, index):
+        template = os.fspath(self.sink)
+        if(self.options["sessions"] == 1 and self.options["workers"] <= 1):
+            return template
+
+        root, ext = os.path.splitext(template)
+        if(self.options["workers"] > 1):
+            return root + "." + str(self.worker) + "-" + str(index) + ext
+        return root + "." + str(index) + ext
+
+    # path with the worker's number in it when there are several workers
+    def workerName(self, path):
+        if(self.options["workers"] <= 1):
+            return path
+        return path + "." + str(self.worker)
+
+    def logTime(self, packet, type, symbol):
+        self.eventLog.record(packet, type, symbol)
+
+# serves port with one receiver, or with --workers processes sharing it
+def listen(port, sink="out.bin", options=None, report=quiet):
+    options = settings(RECEIVER_OPTIONS, options)
+    if(options["workers"] <= 1):
+        Receiver(port, sink, options, report=report).serve()
+        return
+    # a worker only knows how many transfers it served itself
+    if(options["sessions"]):
+        raise ValueError("--workers needs --sessions=0")
+
+    # every worker binds the same port, the kernel hashes each sender's
+    # address to one of them so a session never moves between processes
+    workers = []
+    for worker in range(options["workers"]):
+        process = multiprocessing.Process(target=serveWorker, \
+            args=(port, sink, options, worker, report), daemon=True)
+        process.start()
+        workers.append(process)
+    # exiting normally takes the daemon workers down with us
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    for process in workers:
+        process.join()
+
+def serveWorker(port, sink, options, worker, report):
+    Receiver(port, sink, options, worker, report=report).serve()
+
+# False only when function certainly can't be called with args
+def accepts(function, *args):
+    if(not callable(function)):
+        return False
+    try:
+        inspect.signature(function).bind(*args)
+    except TypeError:
+        return False
+    except ValueError:
+        # no signature to go by, e.g. some builtins
+        pass
+
+    return True
+
+# tells the writable a sinkFactory gave out for a transfer that it is over
+def endSink(target, complete):
+    if(complete or not hasattr(target, "abort")):
+        target.close()
+    else:
+        target.abort()
+
+def newPacket(type, length, checkSum, seqNum, ackNum, msg=None):
+    packet = []
+    packet.append(type)
+    packet.append(length)
+    packet.append(checkSum)
+    packet.append(seqNum)
+    packet.append(ackNum)
+
+    if(msg is not None):
+        packet.append(msg)
+
+    return packet
+
+def getType(packet):
+    return packet[0]
+
+def getLastSeq(packet):
+    return packet[1]
+
+def getLastAck(packet):
+    return packet[2]
@@ -0,0 +1,107 @@
+import time
+
+"""
+Hierarchical timer wheel used by the sender's and receiver's event loops
+
+Level 0 has one slot per millisecond tick, every level above it covers
+256 times the span of the one below. A timer goes into the lowest level
+whose span still reaches its deadline and is cascaded down as the wheel
+turns, so scheduling, cancelling and firing are all O(1) no matter how
+many timers are pending. Timers fire on the first tick at or after their
+deadline.
+"""
+
+BITS = 8
+SLOTS = 1 << BITS
+MASK = SLOTS - 1
+LEVELS = 4
+
+class Timer:
+    __slots__ = ("due", "callback", "args", "cancelled")
+
+    def __init__(self, due, callback, args):
+        self.due = due
+        self.callback = callback
+        self.args = args
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+class TimerWheel:
+    def __init__(self, tick=0.001, clock=time.monotonic):
+        self.tick = tick
+        self.clock = clock
+        self.current = int(clock() / tick)
+        self.wheels = [[[] for i in range(SLOTS)] for level in range(LEVELS)]
+        self.pending = 0
+
+    def __len__(self):
+        return self.pending
+
+    def schedule(self, delay, callback, *args):
+        due = int((self.clock() + delay) / self.tick + 0.999999)
+        timer = Timer(max(due, self.current + 1), callback, args)
+        self.place(timer)
+        self.pending += 1
+
+        return timer
+
+    def place(self, timer):
+        delta = timer.due - self.current
+        level = 0
+        while(level < LEVELS - 1 and delta >= 1 << (BITS * (level + 1))):
+            level += 1
+
+        due = min(timer.due, self.current + (1 << (BITS * (level + 1))) - 1)
+        self.wheels[level][(due >> (BITS * level)) & MASK].append(timer)
+
+    # seconds until the wheel next needs to turn, None when nothing is pending
+    def nextDeadline(self):
+        if(not self.pending):
+            return None
+
+        # look no further than the next wrap, that is when upper levels cascade
+        level0 = self.wheels[0]
+        for ahead in range(1, SLOTS - (self.current & MASK) + 1):
+            if(level0[(self.current + ahead) & MASK]):
+                break
+        due = self.current + ahead
+
+        return max(0, due * self.tick - self.clock())
+
+    def advance(self):
+        target = int(self.clock() / self.tick)
+        if(not self.pending):
+            self.current = max(self.current, target)
+            return
+
+        while(self.current < target and self.pending):
+            self.step()
+        self.current = max(self.current, target)
+
+    def step(self):
+        self.current += 1
+        now = self.current
+
+        # a lower level wrapped, pull the matching slots of the levels above
+        level = 1
+        while(level < LEVELS and not now & ((1 << (BITS * level)) - 1)):
+            level += 1
+        for upper in range(level - 1, 0, -1):
+            slot = self.wheels[upper][(now >> (BITS * upper)) & MASK]
+            timers = slot[:]
+            del slot[:]
+            for timer in timers:
+                self.place(timer)
+
+        slot = self.wheels[0][now & MASK]
+        while(slot):
+            timer = slot.pop()
+            if(timer.due > now):
+                self.place(timer)
+                continue
+
+            self.pending -= 1
+            if(not timer.cancelled):
+                timer.callback(*timer.args)
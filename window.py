@@ -0,0 +1,123 @@
+import time
+from collections import deque
+
+"""
+Send window for the sender
+
+Holds only the segments that are in flight, oldest first, and frees them
+as soon as a cumulative ACK covers them, so the sender's memory follows the
+window and not the size of the file. The oldest unacked segment (the one a
+timeout or fast retransmit resends) is always at the front.
+
+SACK blocks from the receiver mark segments it already holds, a segment
+with at least DUPTHRESH SACKed segments above it counts as lost (RFC 6675)
+and is what loss recovery resends, SACKed data never is.
+"""
+
+DUPTHRESH = 3
+
+class Segment:
+    __slots__ = ("seq", "end", "chunk", "chkSum", "sentAt", "retransmits", \
+        "sacked", "recovered")
+
+    # a compressed chunk covers length bytes of the file
+    def __init__(self, seq, chunk, chkSum, length=None):
+        self.seq = seq
+        self.end = seq + (len(chunk) if length is None else length)
+        self.chunk = chunk
+        self.chkSum = chkSum
+        self.sentAt = time.monotonic()
+        self.retransmits = 0
+        self.sacked = False
+        self.recovered = False      # already resent since it was found lost
+
+    def __len__(self):
+        return self.end - self.seq
+
+class SendWindow:
+    def __init__(self):
+        self.segments = deque()
+        self.bySeq = {}
+        self.inFlightBytes = 0
+        self.lastAcked = None
+        self.sackedCount = 0
+        self.sackedBytes = 0
+
+    def __len__(self):
+        return len(self.segments)
+
+    @property
+    def inFlightCount(self):
+        return len(self.segments)
+
+    # bytes actually in the network, SACKed data has left it (RFC 6675)
+    @property
+    def pipe(self):
+        return self.inFlightBytes - self.sackedBytes
+
+    # one past the newest byte sent, None when nothing is in flight
+    @property
+    def end(self):
+        if(self.segments):
+            return self.segments[-1].end
+        return None
+
+    def push(self, seq, chunk, chkSum, length=None):
+        segment = Segment(seq, chunk, chkSum, length)
+        self.segments.append(segment)
+        self.bySeq[seq] = segment
+        self.inFlightBytes += len(segment)
+
+        return segment
+
+    # frees everything below cumAck, returns how many segments that was
+    def ack(self, cumAck):
+        segments = self.segments
+        freed = 0
+        self.lastAcked = None
+        while(segments and segments[0].end <= cumAck):
+            segment = segments.popleft()
+            del self.bySeq[segment.seq]
+            self.inFlightBytes -= len(segment)
+            self.lastAcked = segment
+            if(segment.sacked):
+                self.sackedCount -= 1
+                self.sackedBytes -= len(segment)
+            freed += 1
+
+        return freed
+
+    # oldest unacked segment, None once everything is acked
+    def first(self):
+        if(self.segments):
+            return self.segments[0]
+        return None
+
+    def get(self, seq):
+        return self.bySeq.get(seq)
+
+    # the receiver holds [start, end), blocks line up with segment boundaries
+    def sack(self, start, end):
+        segment = self.bySeq.get(start)
+        while(segment is not None and segment.end <= end):
+            if(not segment.sacked):
+                segment.sacked = True
+                self.sackedCount += 1
+                self.sackedBytes += len(segment)
+            segment = self.bySeq.get(segment.end)
+
+    # unsacked segments with at least DUPTHRESH SACKed segments above them
+    def lost(self):
+        lost = []
+        if(not self.sackedCount):
+            return lost
+
+        sackedAbove = 0
+        for segment in reversed(self.segments):
+            if(segment.sacked):
+                sackedAbove += 1
+            elif(sackedAbove >= DUPTHRESH):
+                lost.append(segment)
+        lost.reverse()
+
+        return lost
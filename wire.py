@@ -0,0 +1,369 @@
+import struct, pickle, io
+
+"""
+Binary wire format shared by sender.py and receiver.py
+
+Every segment starts with a fixed header (network byte order), followed by
+optLen bytes of options and then the payload. Data and control segments
+use the full header, the receiver's ACKs a short one without checksum,
+length or connection id:
+
+    full    version type flags optLen checksum connId length seq ack [tsval tsecr]
+               B      B    B     H       H        I      H     I   I    I     I
+    short   version type flags optLen seq ack [tsval tsecr]
+               B      B    B     H     I   I    I     I
+
+The top bits of the type byte say which layout follows, so a segment is
+read with one unpack_from(): SHORT for the ACK form, STAMPED when the
+timestamp (tsval, tsecr) is in the header and WIDE when seq and ack are
+64 bits (Q), which only a stream of more than 4 GiB needs. Any other
+options are (kind: B, length: H, value) triples. Neither side copies the
+payload: decoding hands it back as a slice of what it was given (a
+memoryview over the receive buffer, see stp.py), and encoding returns a
+segment with a payload as (header, payload) for a scatter/gather send
+(see batch.py).
+
+Version 1 is the original pickled python list. It is still understood so an
+old peer can talk to a new one: the sender advertises VERSION (plus the
+options it would have put in a binary Syn) as the payload of a pickled Syn
+and switches to the binary format once the receiver answers with a binary
+Synack. A pickle is only ever read back into a list of str, int and bytes,
+anything that would make the unpickler import a name is refused, and the
+receiver only takes one for a Syn or from a peer that never switched.
+"""
+
+VERSION_PICKLE = 1
+VERSION = 2
+
+OPTION = struct.Struct("!BH")
+
+# layout bits in the type byte, the code itself is in the low bits
+SHORT = 0x80
+WIDE = 0x40
+STAMPED = 0x20
+TYPE_MASK = 0x1f
+NARROW_LIMIT = 0xffffffff
+
+# one header layout per combination of the layout bits, by type >> 5
+LAYOUTS = []
+for form in range(8):
+    fields = "!BBBH" + ("" if form & (SHORT >> 5) else "HIH") + \
+        ("QQ" if form & (WIDE >> 5) else "II") + ("II" if form & (STAMPED >> 5) else "")
+    LAYOUTS.append(struct.Struct(fields))
+HEADER_SIZE = LAYOUTS[0].size
+
+# the receiver's ACKs and the sender's data segments
+FORM_MASK = SHORT | WIDE | STAMPED
+ACK_FORM = SHORT | STAMPED
+DATA_FORM = STAMPED
+unpackAck = LAYOUTS[ACK_FORM >> 5].unpack_from
+unpackData = LAYOUTS[DATA_FORM >> 5].unpack_from
+DATA_SIZE = LAYOUTS[DATA_FORM >> 5].size
+
+# packet types, the code on the wire is the index in this list
+TYPES = [None, "Syn", "Synack", "Ack", "Psh", "Rxt", "Fin", "DupAck", "Buf", \
+    "Probe", "Fec"]
+TYPE_CODES = {name: code for code, name in enumerate(TYPES) if name}
+# by the whole type byte, layout bits and all, unknown codes read as None
+types = [(TYPES + [None] * TYPE_MASK)[code & TYPE_MASK] for code in range(256)]
+
+# flags
+FLAG_COMPRESSED = 0x02      # payload compressed with the codec agreed in the Syn
+
+# option kinds
+OPT_TIMESTAMP = 1           # (tsval, tsecr): send time of a segment and its echo
+OPT_SACK = 2                # [start, end) byte ranges held past the ack
+OPT_CONNECTION = 3          # connection id a pickled Syn cannot carry in a header
+OPT_STREAM = 4              # transfer id, index, count, offset: one part of a file
+OPT_MSS = 5                 # largest payload offered in a Syn, accepted in a Synack
+OPT_COMPRESS = 6            # codec ids offered in a Syn, the one picked in a Synack
+OPT_RESUME = 7              # key of a transfer the sender wants to pick up again
+OPT_RANGES = 8              # [start, end) byte ranges of it the receiver holds
+OPT_FEC = 9                 # repair segments wanted (Syn, Synack), rebuilt so far (ACK)
+
+# at most this many SACK blocks go into one ACK
+MAX_SACK_BLOCKS = 4
+
+# at most this many held ranges go into a Synack, the sender reads 4096 bytes
+MAX_RANGES = 200
+
+# timestamps are microseconds on the sender's clock, modulo 2 ** 32
+TIMESTAMP = struct.Struct("!II")
+SACK_BLOCK = struct.Struct("!QQ")
+CONNECTION = struct.Struct("!I")
+STREAM = struct.Struct("!IHHQ")
+MSS = struct.Struct("!I")
+RECOVERED = struct.Struct("!I")
+
+# largest UDP payload over IPv4
+MAX_DATAGRAM = 65507
+# what a data segment carries besides its payload: header and timestamp
+DATA_OVERHEAD = LAYOUTS[(WIDE | STAMPED) >> 5].size
+MAX_MSS = MAX_DATAGRAM - DATA_OVERHEAD
+# an old receiver reads at most 4096 bytes of pickled list
+LEGACY_MSS = 4000
+
+# pickled packets always start with the PROTO opcode
+PICKLE_MARK = 0x80
+
+NO_OPTIONS = {}
+
+# what decode() and the option readers raise for a datagram that isn't a
+# well formed segment
+MALFORMED = (ValueError, LookupError, EOFError, struct.error, pickle.UnpicklingError)
+
+ADVERT = b"STP"
+
+def advertise(options=None):
+    return ADVERT + bytes([VERSION]) + encodeOptions(options or NO_OPTIONS)
+
+# version and options a pickled Syn advertised, version 1 without options if
+# it came from an old sender
+def advertised(msg):
+    if(msg and bytes(msg[:len(ADVERT)]) == ADVERT and len(msg) > len(ADVERT)):
+        version = min(msg[len(ADVERT)], VERSION)
+        return version, decodeOptions(memoryview(msg)[len(ADVERT) + 1:])
+
+    return VERSION_PICKLE, NO_OPTIONS
+
+def stamp(when):
+    return int(when * 1000000) & 0xffffffff
+
+def timestamp(tsval, tsecr=0):
+    return {OPT_TIMESTAMP: (tsval, tsecr)}
+
+def sack(blocks):
+    return {OPT_SACK: b"".join(SACK_BLOCK.pack(start, end) for start, end in blocks)}
+
+def connection(connId):
+    return {OPT_CONNECTION: CONNECTION.pack(connId)}
+
+# connection id from a Syn's options, 0 if the sender did not pick one
+def readConnection(options):
+    value = options.get(OPT_CONNECTION)
+    if(value is None):
+        return 0
+
+    return CONNECTION.unpack(value)[0]
+
+def stream(transfer, index, count, offset):
+    return {OPT_STREAM: STREAM.pack(transfer, index, count, offset)}
+
+# (transfer, index, count, offset) from a Syn's options, None for a whole
+# file sent over a single stream
+def readStream(options):
+    value = options.get(OPT_STREAM)
+    if(value is None):
+        return None
+
+    return STREAM.unpack(value)
+
+def mss(size):
+    return {OPT_MSS: MSS.pack(size)}
+
+# the MSS an endpoint offered or accepted, 0 if it said nothing
+def readMss(options):
+    value = options.get(OPT_MSS)
+    if(value is None):
+        return 0
+
+    return MSS.unpack(value)[0]
+
+def compression(ids):
+    return {OPT_COMPRESS: bytes(ids)}
+
+# codec ids from a Syn or Synack, see compress.py
+def readCompression(options):
+    return list(options.get(OPT_COMPRESS, b""))
+
+def resume(key):
+    return {OPT_RESUME: bytes(key)}
+
+# the key of the transfer a Syn resumes, None for a fresh one
+def readResume(options):
+    value = options.get(OPT_RESUME)
+    if(value is None):
+        return None
+
+    return bytes(value)
+
+# byte ranges are offsets into the file, unlike SACK blocks which are
+# sequence numbers
+def ranges(held):
+    return {OPT_RANGES: b"".join(SACK_BLOCK.pack(start, end) \
+        for start, end in held[:MAX_RANGES])}
+
+def readRanges(options):
+    value = options.get(OPT_RANGES)
+    if(value is None):
+        return []
+
+    return readSack(value)
+
+# offered in a Syn and accepted in a Synack with no count, see fec.py
+def fec(recovered=None):
+    return {OPT_FEC: b"" if recovered is None else RECOVERED.pack(recovered)}
+
+# None without the option, else the segments the receiver rebuilt (0 in a
+# handshake)
+def readFec(options):
+    value = options.get(OPT_FEC)
+    if(value is None):
+        return None
+    if(not value):
+        return 0
+
+    return RECOVERED.unpack(value)[0]
+
+# receive buffer for segments of up to mss bytes of payload
+def datagramSize(mss):
+    return min(mss + DATA_OVERHEAD, MAX_DATAGRAM)
+
+def readSack(value):
+    return [SACK_BLOCK.unpack_from(value, offset) \
+        for offset in range(0, len(value), SACK_BLOCK.size)]
+
+# seconds between an echoed tsval and now
+def elapsed(tsecr, now):
+    return ((stamp(now) - tsecr) & 0xffffffff) / 1000000
+
+# the timestamp only goes into options in a pickled Syn's advert
+def encodeOptions(options):
+    parts = []
+    for kind, value in options.items():
+        if(kind == OPT_TIMESTAMP):
+            value = TIMESTAMP.pack(*value)
+        parts.append(OPTION.pack(kind, len(value)))
+        parts.append(value)
+
+    return b"".join(parts)
+
+def decodeOptions(view, options=NO_OPTIONS):
+    options = dict(options)
+    offset = 0
+    while(offset < len(view)):
+        kind, length = OPTION.unpack_from(view, offset)
+        offset += OPTION.size
+        if(offset + length > len(view)):
+            raise ValueError("option " + str(kind) + " runs past the header")
+        if(kind == OPT_TIMESTAMP):
+            options[kind] = TIMESTAMP.unpack_from(view, offset)
+        else:
+            options[kind] = view[offset:offset + length]
+        offset += length
+
+    return options
+
+# bytes, or (header, payload) for a segment with a payload
+def encode(packet, version=VERSION, connId=0, flags=0, options=None):
+    if(version == VERSION_PICKLE):
+        if(len(packet) == 6 and not isinstance(packet[5], bytes)):
+            packet = packet[:5] + [bytes(packet[5])]
+        return pickle.dumps(packet)
+
+    form = 0
+    stamp = None
+    opts = b""
+    if(options):
+        stamp = options.get(OPT_TIMESTAMP)
+        if(stamp is None):
+            opts = encodeOptions(options)
+        else:
+            form = STAMPED
+            if(len(options) > 1):
+                opts = encodeOptions({kind: value for kind, value in options.items() \
+                    if kind != OPT_TIMESTAMP})
+
+    if(len(packet) == 3):
+        seq = packet[1]
+        ack = packet[2]
+        form |= SHORT
+    else:
+        seq = packet[3]
+        ack = packet[4]
+    if(seq > NARROW_LIMIT or ack > NARROW_LIMIT):
+        form |= WIDE
+
+    type = TYPE_CODES[packet[0]] | form
+    layout = LAYOUTS[form >> 5]
+    if(form & SHORT):
+        if(stamp is None):
+            header = layout.pack(VERSION, type, flags, len(opts), seq, ack)
+        else:
+            header = layout.pack(VERSION, type, flags, len(opts), seq, ack, \
+                stamp[0], stamp[1])
+    elif(stamp is None):
+        header = layout.pack(VERSION, type, flags, len(opts), packet[2], connId, \
+            packet[1], seq, ack)
+    else:
+        header = layout.pack(VERSION, type, flags, len(opts), packet[2], connId, \
+            packet[1], seq, ack, stamp[0], stamp[1])
+    if(opts):
+        header += opts
+    if(len(packet) == 6):
+        return header, packet[5]
+
+    return header
+
+# packet, version, flags, connId, options. The payload is a slice of data,
+# a memoryview over a receive buffer keeps it from being copied.
+def decode(data):
+    if(data[0] == VERSION):
+        # the two forms nearly every segment takes are read inline
+        form = data[1] & FORM_MASK
+        if(form == ACK_FORM):
+            version, type, flags, optLen, seq, ack, tsval, tsecr = unpackAck(data)
+            if(not optLen):
+                return [types[type], seq, ack], version, flags, 0, \
+                    {OPT_TIMESTAMP: (tsval, tsecr)}
+        elif(form == DATA_FORM):
+            version, type, flags, optLen, chkSum, connId, length, seq, ack, \
+                tsval, tsecr = unpackData(data)
+            if(not optLen and len(data) > DATA_SIZE):
+                return [types[type], length, chkSum, seq, ack, \
+                    data[DATA_SIZE:]], version, flags, connId, \
+                    {OPT_TIMESTAMP: (tsval, tsecr)}
+        return decodeAny(data)
+    if(data[0] == PICKLE_MARK):
+        return unpickle(data), VERSION_PICKLE, 0, 0, NO_OPTIONS
+    raise ValueError("unsupported wire version " + str(data[0]))
+
+# a pickled segment can only hold plain values, building any object means
+# looking its class up first
+class SegmentUnpickler(pickle.Unpickler):
+    def find_class(self, module, name):
+        raise pickle.UnpicklingError("pickled segment refers to " + module + "." + name)
+
+def unpickle(data):
+    packet = SegmentUnpickler(io.BytesIO(data)).load()
+    if(type(packet) is not list or not 3 <= len(packet) <= 6 or \
+            type(packet[0]) is not str or packet[0] not in TYPE_CODES or \
+            not all(type(value) is int and value >= 0 for value in packet[1:5]) or \
+            (len(packet) == 6 and type(packet[5]) is not bytes)):
+        raise ValueError("pickled data is not a segment")
+
+    return packet
+
+def decodeAny(data):
+    type = data[1]
+    layout = LAYOUTS[type >> 5]
+    fields = layout.unpack_from(data)
+    optLen = fields[3]
+    start = layout.size + optLen
+    if(start > len(data)):
+        raise ValueError("options run past the datagram")
+
+    options = NO_OPTIONS
+    if(type & STAMPED):
+        options = {OPT_TIMESTAMP: fields[-2:]}
+    if(optLen):
+        options = decodeOptions(memoryview(data)[layout.size:start], options)
+
+    if(type & SHORT):
+        return [types[type], fields[4], fields[5]], VERSION, fields[2], \
+            0, options
+
+    packet = [types[type], fields[6], fields[4], fields[7], fields[8]]
+    if(len(data) > start):
+        packet.append(data[start:])
+    return packet, VERSION, fields[2], fields[5], options
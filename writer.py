@@ -0,0 +1,91 @@
+import os
+from collections import deque
+
+"""
+Output file for the receiver
+
+The destination is opened once and every segment is written at its own
+byte offset (seq - 1), so segments that arrive out of order go straight to
+disk instead of waiting in memory for the gap in front of them.
+
+StreamWriter hands the data to a callback in order instead, for the
+library's stream sinks (see stp.py). Segments past a gap wait in memory,
+which the sender's window bounds, and the last KEEP bytes delivered are
+kept for read() to rebuild lost segments from (see fec.py).
+"""
+
+KEEP = 4 << 20
+
+class OutputWriter:
+    def __init__(self, path, truncate=True):
+        flags = os.O_RDWR | os.O_CREAT
+        if(truncate):
+            flags |= os.O_TRUNC
+        self.fd = os.open(path, flags, 0o644)
+
+    def write(self, offset, data):
+        view = memoryview(data)
+        while(view):
+            written = pwrite(self.fd, view, offset)
+            view = view[written:]
+            offset += written
+
+    def read(self, offset, length):
+        return os.pread(self.fd, length, offset)
+
+    def close(self):
+        os.close(self.fd)
+
+class StreamWriter:
+    def __init__(self, deliver, keep=KEEP):
+        self.deliver = deliver
+        self.keep = keep
+        # offset of the next byte to deliver, what waits behind a gap
+        self.next = 0
+        self.pending = {}
+        # offset -> data of what was delivered last, oldest first
+        self.recent = {}
+        self.order = deque()
+        self.kept = 0
+        self.size = 0
+
+    def write(self, offset, data):
+        if(offset < self.next):
+            return
+        if(offset + len(data) > self.size):
+            self.size = offset + len(data)
+        if(offset > self.next):
+            self.pending[offset] = bytes(data)
+            return
+
+        self.push(bytes(data))
+        while(self.next in self.pending):
+            self.push(self.pending.pop(self.next))
+
+    def push(self, data):
+        self.deliver(data)
+        self.recent[self.next] = data
+        self.order.append(self.next)
+        self.kept += len(data)
+        self.next += len(data)
+        while(self.kept > self.keep):
+            self.kept -= len(self.recent.pop(self.order.popleft()))
+
+    # only what a segment was written as, and only while it is kept
+    def read(self, offset, length):
+        data = self.recent.get(offset)
+        if(data is None):
+            data = self.pending.get(offset, b"")
+        return data[:length]
+
+    def close(self):
+        self.pending.clear()
+        self.recent.clear()
+        self.order.clear()
+
+def seekWrite(fd, data, offset):
+    os.lseek(fd, offset, os.SEEK_SET)
+    return os.write(fd, data)
+
+# os.pwrite is not available everywhere (e.g. Windows)
+pwrite = getattr(os, "pwrite", seekWrite)